@@ -1,53 +1,28 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, model_settings, ModelSettings, function_tool
-from agents.run import RunConfig
+from agents import Agent, Runner, model_settings, ModelSettings, function_tool
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 import asyncio
-import requests
+from weather import get_weather_text
+from tool_cache import cached_tool
 
 
-load_dotenv()
+model = get_model()
 
+config = get_run_config(ModelSettings(temperature=0.7, top_p=0.7))
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True,
-    model_settings=ModelSettings(temperature=0.7, top_p=0.7)
-)
-
-
-@function_tool
-def get_weather(city: str) -> str:
+@cached_tool
+async def get_weather(city: str) -> str:
     '''Get weather for the given city
     '''
     print('tool called')
-    result = requests.get(f"http://api.weatherapi.com/v1/current.json?key=8e3aca2b91dc4342a1162608252604&q={city}")
-    data = result.json()
-    return f"{data['current']['temp_c']}°C with {data['current']['condition']['text']}"
+    return await get_weather_text(city)
 
 
 
 weather_agent = Agent(
     name='Weather Agent',
-    instructions='You are weather agent. If API fails to fetch weather, try again 3 more times calling the same tool.',
+    instructions='You are weather agent. If the tool reports that it could not fetch weather, tell the user instead of calling it again.',
     model=model,
     tools=[get_weather]
 )
@@ -62,4 +37,5 @@ async def main():
         )
         print(f'Ai: {result.final_output}')
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
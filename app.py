@@ -1,35 +1,11 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, model_settings, ModelSettings
-from agents.run import RunConfig
+from agents import Agent, Runner, model_settings, ModelSettings
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 
 
-load_dotenv()
+model = get_model()
 
-
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True,
-    model_settings=ModelSettings(temperature=0.7, top_p=0.7)
-)
+config = get_run_config(ModelSettings(temperature=0.7, top_p=0.7))
 
 
 agent = Agent(
@@ -40,11 +16,12 @@ agent = Agent(
 
 
 
-while True:
-    user_input = input('User: ')
-    result = Runner.run_sync(
-        agent,
-        user_input, 
-        run_config=config, 
-    )
-    print(f'Ai: {result.final_output}')
\ No newline at end of file
+if __name__ == '__main__':
+    while True:
+        user_input = input('User: ')
+        result = Runner.run_sync(
+            agent,
+            user_input, 
+            run_config=config, 
+        )
+        print(f'Ai: {result.final_output}')
\ No newline at end of file
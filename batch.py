@@ -0,0 +1,137 @@
+import json
+import time
+import asyncio
+import argparse
+import provider
+from registry import load_agent, serialize_output
+from guardrail_pipeline import run_guarded
+from stats import summarize_latencies
+from ratelimit import BATCH, priority
+from metrics import METRICS_PATH, MetricsHooks, metrics
+
+
+def read_prompts(path: str):
+    '''Yield (id, input) pairs. Lines are either {"id": ..., "input": ...} objects or bare JSON strings.'''
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield str(number), record
+            else:
+                yield str(record.get('id', number)), record['input']
+
+
+def read_checkpoint(path: str, retry_errors: bool = False) -> set[str]:
+    '''Ids already present in the output file. Results are appended one line at a time, so the
+    output file doubles as the checkpoint for resuming.'''
+    done = set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last line may be half written if the previous run crashed
+                    continue
+                if retry_errors and 'error' in record:
+                    continue
+                done.add(record['id'])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def truncate_partial_line(path: str):
+    '''Cut a half-written last line (left by a crash) off the output file, so the next record
+    starts on a line of its own instead of being glued to the fragment.'''
+    try:
+        with open(path, 'rb+') as f:
+            end = f.seek(0, 2)
+            position = end
+            while position > 0:
+                chunk_start = max(0, position - 4096)
+                f.seek(chunk_start)
+                newline = f.read(position - chunk_start).rfind(b'\n')
+                if newline != -1:
+                    position = chunk_start + newline + 1
+                    break
+                position = chunk_start
+            if position != end:
+                f.truncate(position)
+    except FileNotFoundError:
+        pass
+
+
+async def run_batch(agent_name: str, input_path: str, output_path: str, concurrency: int = 8,
+                    timeout: float = 120, retry_errors: bool = False) -> dict:
+    agent, config = load_agent(agent_name, allow_specs=True)
+    done = read_checkpoint(output_path, retry_errors)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies: list[float] = []
+    errors = 0
+    hooks = MetricsHooks()
+
+    async def worker(out):
+        nonlocal errors
+        while (job := await queue.get()) is not None:
+            prompt_id, user_input = job
+            started = time.perf_counter()
+            record = {'id': prompt_id, 'input': user_input}
+            try:
+                result = await asyncio.wait_for(run_guarded(agent, user_input, run_config=config, hooks=hooks), timeout)
+                record['agent'] = result.last_agent.name
+                record['output'] = serialize_output(result.final_output)
+            except Exception as e:
+                errors += 1
+                record['error'] = repr(e)
+            record['latency'] = time.perf_counter() - started
+            latencies.append(record['latency'])
+
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+
+    truncate_partial_line(output_path)
+    started = time.perf_counter()
+    with open(output_path, 'a', encoding='utf-8') as out, priority(BATCH):
+        # Workers copy the current context, so all their model calls queue in the batch lane
+        workers = [asyncio.create_task(worker(out)) for _ in range(concurrency)]
+        for prompt_id, user_input in read_prompts(input_path):
+            if prompt_id not in done:
+                await queue.put((prompt_id, user_input))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started
+    if METRICS_PATH:
+        metrics.write_file(METRICS_PATH)
+
+    return {
+        'processed': len(latencies),
+        'skipped': len(done),
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency': summarize_latencies(latencies),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a JSONL file of prompts through an agent.')
+    parser.add_argument('input', help='JSONL file with one prompt per line')
+    parser.add_argument('output', help='JSONL file to append results to; also used to resume')
+    parser.add_argument('--agent', default='triage', help='agent name from registry.py or module:attribute')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--timeout', type=float, default=120, help='seconds per prompt')
+    parser.add_argument('--retry-errors', action='store_true', help='re-run prompts that failed last time')
+    args = parser.parse_args()
+
+    async def main():
+        try:
+            report = await run_batch(args.agent, args.input, args.output, args.concurrency, args.timeout, args.retry_errors)
+        finally:
+            await provider.aclose()
+        print(json.dumps(report, indent=2))
+
+    asyncio.run(main())
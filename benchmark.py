@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+from typing import Awaitable, Callable
+from stats import summarize_latencies
+
+
+# Scenario inputs. Each scenario gets the iteration number so inputs can vary per run.
+Scenario = Callable[[int], Awaitable[dict | None]]
+
+# The maths agent's output guardrail only accepts numbers
+MOCK_SCRIPT = [{'match': 'only give answer in numbers', 'content': '42'}]
+
+HISTORY_TURNS = 8
+
+
+def build_scenarios() -> dict[str, Scenario]:
+    '''Import the example modules (after the environment points them at the mock server) and wrap
+    each flow they demonstrate in a coroutine that runs it once.'''
+    from agents import Agent, Runner
+    import main
+    import handoff
+    import func_tool
+    import guardrails
+    import streaming
+    import chat_history
+    from guardrail_pipeline import run_guarded
+    from history import ConversationHistory
+    from stream_pipeline import StreamPipeline, MetricsSink
+
+    async def triage(i):
+        # Small talk skips the pre-router, so this pays for the LLM triage hop and the handoff
+        result = await Runner.run(main.router.pick(f'hello there, friend number {i}'), f'hello there, friend number {i}', run_config=main.config)
+        return {'agent': result.last_agent.name}
+
+    async def prerouted(i):
+        result = await Runner.run(main.router.pick(f'{i} * 7'), f'{i} * 7', run_config=main.config)
+        return {'agent': result.last_agent.name}
+
+    async def handoffs(i):
+        result = await Runner.run(handoff.triage_agent, f'tell me something about year {1900 + i}', run_config=handoff.config)
+        return {'agent': result.last_agent.name}
+
+    async def tools(i):
+        await Runner.run(func_tool.calculator_agent, f'add {i} and {i}', run_config=func_tool.config)
+
+    async def guarded(i):
+        await run_guarded(guardrails.math_homework_agent, f'homework question {i}', run_config=guardrails.config)
+
+    async def streamed(i):
+        agent = Agent(name='Joker', instructions='First call the `how_many_jokes` tool, then tell that many jokes.',
+                      model=streaming.model, tools=[streaming.how_many_jokes])
+        sink = MetricsSink()
+        await StreamPipeline([sink]).run(Runner.run_streamed(agent, input='Hello', run_config=streaming.config))
+        return {'time_to_first_delta': sink.first_delta}
+
+    async def history(i):
+        convo = ConversationHistory(max_tokens=4000)
+        for turn in range(HISTORY_TURNS):
+            convo.add_user(f'question {turn} of conversation {i}')
+            convo.add_result(await Runner.run(chat_history.agent, convo.to_input(), run_config=chat_history.config))
+            await convo.compact()
+        return {'history_tokens': convo.tokens}
+
+    return {'triage': triage, 'prerouted': prerouted, 'handoff': handoffs, 'tools': tools,
+            'guardrails': guarded, 'streaming': streamed, 'history': history}
+
+
+async def run_scenario(scenario: Scenario, iterations: int, concurrency: int, warmup: int, memory_iterations: int) -> dict:
+    for i in range(warmup):
+        await scenario(-1 - i)
+
+    latencies: list[float] = []
+    extras: dict[str, list] = {}
+    errors: list[str] = []
+    next_iteration = iter(range(iterations))
+
+    async def worker():
+        for i in next_iteration:
+            started = time.perf_counter()
+            try:
+                extra = await scenario(i)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+            for key, value in (extra or {}).items():
+                extras.setdefault(key, []).append(value)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Memory is measured in a separate, shorter pass so tracemalloc doesn't slow the timed one
+    tracemalloc.start()
+    try:
+        await asyncio.gather(*(scenario(iterations + i) for i in range(memory_iterations)), return_exceptions=True)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    report = {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency': summarize_latencies(latencies),
+        'peak_memory_kib': peak / 1024,
+    }
+    if errors:
+        report['first_error'] = errors[0]
+    for key, values in extras.items():
+        numbers = [value for value in values if isinstance(value, (int, float))]
+        report[key] = sum(numbers) / len(numbers) if numbers else values[-1]
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    '''Regressions of more than `tolerance` (a fraction) against the baseline, one line each.'''
+    regressions = []
+    for name, current in report.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        checks = [(f'latency {p}', current['latency'].get(p, 0), before['latency'].get(p, 0), 1) for p in ('p50', 'p95', 'p99')]
+        checks += [('throughput', current['throughput'], before['throughput'], -1),
+                   ('peak memory', current['peak_memory_kib'], before['peak_memory_kib'], 1)]
+        for label, now, then, direction in checks:
+            if then and (now - then) / then * direction > tolerance:
+                regressions.append(f'{name}: {label} {then:.4g} -> {now:.4g} ({(now - then) / then:+.0%})')
+    return regressions
+
+
+def print_report(report: dict):
+    print(f'{"scenario":<12}{"iters":>7}{"err":>5}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"peak KiB":>10}')
+    for name, r in report.items():
+        latency = r['latency']
+        print(f'{name:<12}{r["iterations"]:>7}{r["errors"]:>5}{r["throughput"]:>9.1f}'
+              f'{latency.get("p50", 0) * 1000:>9.1f}{latency.get("p95", 0) * 1000:>9.1f}{latency.get("p99", 0) * 1000:>9.1f}'
+              f'{r["peak_memory_kib"]:>10.0f}')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(port: int, latency: float, tokens_per_second: float, script_path: str) -> subprocess.Popen:
+    '''Run the mock in its own process so serving requests doesn't compete with the agents for the GIL.'''
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_server.py'),
+                                '--port', str(port), '--latency', str(latency),
+                                '--tokens-per-second', str(tokens_per_second), '--script', script_path],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError('Mock server did not start')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the example agents against a local mock model server.')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run (default: all)')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--memory-iterations', type=int, default=4, help='concurrent runs traced for peak memory')
+    parser.add_argument('--latency', type=float, default=0.0, help='mock seconds before the first token; 0 isolates framework overhead')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help='mock streaming rate; 0 sends everything at once')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--save-baseline', help='write the report as the new baseline')
+    parser.add_argument('--baseline', help='compare with this baseline and exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed regression as a fraction, default 10%%')
+    args = parser.parse_args()
+
+    port = free_port()
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(MOCK_SCRIPT, f)
+    script_path = f.name
+    mock = start_mock_server(port, args.latency, args.tokens_per_second, script_path)
+
+    # Point every module at the mock before they are imported, and keep the rate limiter out of the way
+    os.environ['GEMINI_BASE_URL'] = f'http://127.0.0.1:{port}/v1/'
+    os.environ['GEMINI_API_KEY'] = 'benchmark'
+    os.environ['GEMINI_RPM'] = os.environ['GEMINI_TPM'] = '1e12'
+
+    async def main():
+        import provider
+        scenarios = build_scenarios()
+        selected = args.scenarios or list(scenarios)
+        report = {}
+        try:
+            for name in selected:
+                report[name] = await run_scenario(scenarios[name], args.iterations, args.concurrency, args.warmup, args.memory_iterations)
+        finally:
+            await provider.aclose()
+        return report
+
+    try:
+        report = asyncio.run(main())
+    finally:
+        mock.terminate()
+        os.remove(script_path)
+
+    print_report(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        sys.exit(1 if regressions else 0)
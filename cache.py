@@ -0,0 +1,251 @@
+import json
+import math
+import re
+import time
+import zlib
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+class SQLiteStore:
+    '''On-disk key/value store with expiry, used behind TTLCache so entries survive restarts.
+
+    Values must be JSON serializable.
+    '''
+
+    def __init__(self, path: str, table: str = 'cache'):
+        # Imported here so in-memory-only caches don't load sqlite3 at startup
+        import sqlite3
+        self.table = table
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+        self.prune()
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        row = self.conn.execute(f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float):
+        with self.conn:
+            self.conn.execute(f'INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)', (key, json.dumps(value), expires_at))
+
+    def delete(self, key: str):
+        with self.conn:
+            self.conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute(f'DELETE FROM {self.table}')
+
+    def prune(self):
+        with self.conn:
+            self.conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),))
+
+    def close(self):
+        self.conn.close()
+
+
+class _FetchCancelled(Exception):
+    '''Tells get_or_fetch waiters that the caller fetching for them was cancelled.'''
+
+
+class TTLCache:
+    '''Bounded in-memory cache with per-entry TTL and LRU eviction.
+
+    Optionally backed by a SQLiteStore: memory misses fall through to disk and every write goes
+    to both. `get_or_fetch` coalesces concurrent misses for the same key into one fetch.
+    '''
+
+    MISSING = object()
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300, store: SQLiteStore | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self._data: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.store_errors = 0
+
+    def peek(self, key: str, default: Any = MISSING) -> Any:
+        '''Like get, but without counting towards the hit/miss statistics.'''
+        entry = self._data.get(key)
+        if entry is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self._remember(key, *entry)
+
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                self.delete(key)
+            return default
+
+        self._data.move_to_end(key)
+        return entry[0]
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        value = self.peek(key, self.MISSING)
+        if value is self.MISSING:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._remember(key, value, expires_at)
+        if self.store is not None:
+            self.store.set(key, value, expires_at)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def clear(self):
+        self._data.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], similar: Callable[[], Any] | None = None) -> Any:
+        '''Return the cached value for key, or await fetch() once and cache its result.
+
+        Callers arriving while a fetch for the same key is running wait for that fetch instead of
+        starting their own. Exceptions are propagated to every waiter and are not cached. If the
+        caller doing the fetch is cancelled, only that caller sees the CancelledError: one of the
+        waiters takes the fetch over and the rest wait for it. A value the store fails to save
+        (e.g. a locked database or a value that isn't JSON) is still returned to everyone and
+        counted in `store_errors`. On an exact miss, `similar()` may return a value cached under a
+        close enough key (see SemanticIndex); that counts as a hit.
+        '''
+        value = self.peek(key)
+        if value is self.MISSING and similar is not None:
+            value = similar()
+            if value is not self.MISSING:
+                self.similar_hits += 1
+        if value is not self.MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        if key in self._inflight:
+            self.coalesced += 1
+        while key in self._inflight:
+            try:
+                return await asyncio.shield(self._inflight[key])
+            except _FetchCancelled:
+                # The fetching caller was cancelled, not this one; the first waiter to get here refetches
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            future.set_exception(_FetchCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        else:
+            # Waiters get the value first, so a failing store write can't leave them hanging
+            future.set_result(value)
+            try:
+                self.set(key, value)
+            except Exception:
+                self.store_errors += 1
+            return value
+        finally:
+            del self._inflight[key]
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'store_errors': self.store_errors,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def hashed_embedding(text: str, dims: int = 4096) -> dict[int, float]:
+    '''Cheap local text embedding: hashed words plus their character trigrams, L2 normalized,
+    as a sparse dict.
+
+    Close enough to catch near-duplicate prompts (typos, spacing, small rewordings) without an
+    embedding model. Swap in a real one through SemanticIndex(embed=...).
+    '''
+    vector: dict[int, float] = {}
+    for word in re.findall(r'\w+|[^\w\s]', text.lower()):
+        padded = f'#{word}#'
+        for feature in [word] + [padded[i:i + 3] for i in range(max(len(padded) - 2, 1))]:
+            # zlib.crc32 rather than hash() so vectors are stable across processes
+            bucket = zlib.crc32(feature.encode()) % dims
+            vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class SemanticIndex:
+    '''Nearest-neighbour lookup over the keys of a TTLCache, for matching near-duplicate inputs.
+
+    Entries whose key has been evicted or expired from the cache are dropped lazily.
+    '''
+
+    def __init__(self, cache: TTLCache, embed: Callable[[str], dict[int, float]] = hashed_embedding, threshold: float = 0.9):
+        self.cache = cache
+        self.embed = embed
+        self.threshold = threshold
+        self._vectors: OrderedDict[str, dict[int, float]] = OrderedDict()
+
+    def add(self, key: str, text: str):
+        self._vectors[key] = self.embed(text)
+        self._vectors.move_to_end(key)
+        while len(self._vectors) > self.cache.maxsize:
+            self._vectors.popitem(last=False)
+
+    def lookup(self, text: str) -> Any:
+        '''Return the cached value of the most similar key above the threshold, or TTLCache.MISSING.'''
+        vector = self.embed(text)
+        best, best_score = None, self.threshold
+        for key, other in list(self._vectors.items()):
+            score = cosine(vector, other)
+            if score >= best_score:
+                best, best_score = key, score
+
+        if best is None:
+            return TTLCache.MISSING
+
+        value = self.cache.peek(best)
+        if value is TTLCache.MISSING:
+            del self._vectors[best]
+        return value
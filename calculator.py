@@ -0,0 +1,220 @@
+import ast
+import json
+import math
+import re
+import operator
+from decimal import ROUND_FLOOR, Context, Decimal, DivisionByZero, localcontext
+
+
+PRECISION = 50
+# Refuse powers whose result would need more bits than this, e.g. 9**9**9
+MAX_POWER_BITS = 100_000
+
+Number = int | Decimal
+
+THOUSANDS_SEPARATOR = re.compile(r'(?<=\d),(?=\d{3}\b)')
+
+
+class CalculationError(Exception):
+    pass
+
+
+def _to_decimal(value: Number) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(value)
+
+
+def _normalize(value: Number) -> Number:
+    '''Keep exact integers as int so big numbers never lose precision.'''
+    if isinstance(value, Decimal) and value == value.to_integral_value() and abs(value.adjusted()) < PRECISION:
+        return int(value)
+    return value
+
+
+def _divide(a: Number, b: Number) -> Number:
+    if b == 0:
+        raise CalculationError('division by zero')
+    if isinstance(a, int) and isinstance(b, int) and a % b == 0:
+        return a // b
+    return _to_decimal(a) / _to_decimal(b)
+
+
+def _floor_quotient(a: Decimal, b: Decimal) -> Decimal:
+    # Decimal's // and % truncate toward zero; Python rounds the quotient toward minus infinity
+    return (a / b).to_integral_value(rounding=ROUND_FLOOR)
+
+
+def _floor_divide(a: Number, b: Number) -> Number:
+    if b == 0:
+        raise CalculationError('division by zero')
+    if isinstance(a, int) and isinstance(b, int):
+        return a // b
+    return int(_floor_quotient(_to_decimal(a), _to_decimal(b)))
+
+
+def _modulo(a: Number, b: Number) -> Number:
+    if b == 0:
+        raise CalculationError('modulo by zero')
+    if isinstance(a, int) and isinstance(b, int):
+        return a % b
+    a, b = _to_decimal(a), _to_decimal(b)
+    return a - b * _floor_quotient(a, b)
+
+
+def _power(a: Number, b: Number) -> Number:
+    if isinstance(b, int) and abs(b) * max(abs(int(a)).bit_length(), 1) > MAX_POWER_BITS:
+        raise CalculationError('result too large')
+    if isinstance(a, int) and isinstance(b, int) and b >= 0:
+        return a ** b
+    if a == 0 and b < 0:
+        raise CalculationError('division by zero')
+    return _to_decimal(a) ** _to_decimal(b)
+
+
+def _sqrt(a: Number) -> Number:
+    if a < 0:
+        raise CalculationError('square root of a negative number')
+    if isinstance(a, int):
+        root = math.isqrt(a)
+        if root * root == a:
+            return root
+    return _to_decimal(a).sqrt()
+
+
+def _via_float(func):
+    def wrapper(*args: Number) -> Number:
+        try:
+            return Decimal(repr(func(*(float(arg) for arg in args))))
+        except (ValueError, OverflowError) as e:
+            raise CalculationError(f'{func.__name__}: {e}')
+    return wrapper
+
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: _divide,
+    ast.FloorDiv: _floor_divide,
+    ast.Mod: _modulo,
+    ast.Pow: _power,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+FUNCTIONS = {
+    'abs': abs,
+    'round': lambda a, digits=0: _to_decimal(a).quantize(Decimal(1).scaleb(-int(digits))),
+    'sqrt': _sqrt,
+    'floor': lambda a: math.floor(a),
+    'ceil': lambda a: math.ceil(a),
+    'min': min,
+    'max': max,
+    'log': _via_float(math.log),
+    'log10': _via_float(math.log10),
+    'sin': _via_float(math.sin),
+    'cos': _via_float(math.cos),
+    'tan': _via_float(math.tan),
+}
+
+CONSTANTS = {
+    'pi': Decimal(repr(math.pi)),
+    'e': Decimal(repr(math.e)),
+}
+
+
+def _evaluate_node(node: ast.AST, source: str) -> Number:
+    if isinstance(node, ast.Expression):
+        return _evaluate_node(node.body, source)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        # ast has already turned float literals into floats, so read the digits from the source
+        # instead (0.1 stays 0.1 and long decimals keep every digit)
+        return node.value if isinstance(node.value, int) else Decimal(ast.get_source_segment(source, node))
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        return BINARY_OPERATORS[type(node.op)](_evaluate_node(node.left, source), _evaluate_node(node.right, source))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return UNARY_OPERATORS[type(node.op)](_evaluate_node(node.operand, source))
+    if isinstance(node, ast.Name) and node.id in CONSTANTS:
+        return CONSTANTS[node.id]
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+        return FUNCTIONS[node.func.id](*(_evaluate_node(arg, source) for arg in node.args))
+    raise CalculationError(f'unsupported syntax: {ast.unparse(node)}')
+
+
+def evaluate(expression: str) -> Number:
+    '''Evaluate an arithmetic expression exactly, without eval.
+
+    Integers stay arbitrary precision; anything fractional is a Decimal with PRECISION digits.
+    Accepts ^, x, × and ÷ as the usual operators. Raises CalculationError on bad input.
+    '''
+    cleaned = THOUSANDS_SEPARATOR.sub('', expression).replace('^', '**').replace('×', '*').replace('÷', '/')
+    cleaned = ' '.join(cleaned.split()).rstrip('=?').strip()
+    # "3 x 4" means multiplication; a bare x elsewhere is left alone and rejected as unknown
+    cleaned = cleaned.replace(' x ', ' * ')
+
+    try:
+        tree = ast.parse(cleaned, mode='eval')
+    except SyntaxError:
+        raise CalculationError(f'could not parse {expression!r}')
+
+    with localcontext(prec=PRECISION):
+        try:
+            return _normalize(_evaluate_node(tree, cleaned))
+        except (DivisionByZero, ZeroDivisionError):
+            raise CalculationError('division by zero')
+        except (ArithmeticError, TypeError, ValueError) as e:
+            raise CalculationError(f'invalid operation: {e!r}')
+
+
+def format_number(value: Number) -> str:
+    if isinstance(value, int):
+        # Decimal prints every digit of an integer, even past Python's int to str limit (4300 digits)
+        return str(Decimal(value))
+    value = value.normalize(Context(prec=PRECISION))
+    return format(value, 'f') if -30 < value.adjusted() < PRECISION else str(value)
+
+
+def calculate_many(expressions: list[str]) -> list[dict]:
+    '''Evaluate a batch of expressions. Each entry has either a `result` or an `error`.'''
+    results = []
+    for expression in expressions:
+        try:
+            results.append({'expression': expression, 'result': format_number(evaluate(expression))})
+        except CalculationError as e:
+            results.append({'expression': expression, 'error': str(e)})
+        except ValueError:
+            # One unprintable result must not fail the rest of the batch
+            results.append({'expression': expression, 'error': 'result too large'})
+    return results
+
+
+def calculate_json(expressions: list[str]) -> str:
+    return json.dumps(calculate_many(expressions))
+
+
+# Expressions with known answers; `python calculator.py` checks them all
+CHECKS = [
+    ('(3+4)*5/2', '17.5'),
+    ('0.1 + 0.2', '0.3'),
+    ('-7 // 2', '-4'),
+    ('-7.5 // 2', '-4'),
+    ('-7.5 % 2', '0.5'),
+    ('-7 % 2.5', '0.5'),
+    ('7.5 % -2', '-0.5'),
+    ('12345678901234567890123.5 * 1', '12345678901234567890123.5'),
+    ('2^100', str(2 ** 100)),
+    ('10^5000', '1' + '0' * 5000),
+]
+
+
+if __name__ == '__main__':
+    failed = 0
+    for expression, expected in CHECKS:
+        entry = calculate_many([expression])[0]
+        if entry.get('result') != expected:
+            failed += 1
+            print(f'FAIL {expression}: expected {expected[:60]}, got {entry}')
+    print(f'{len(CHECKS) - failed}/{len(CHECKS)} checks passed')
+    raise SystemExit(1 if failed else 0)
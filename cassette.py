@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass, asdict
+import httpx
+
+
+# record: call the endpoint and save every exchange. replay: serve only from the cassette.
+# auto: replay what is there and record the rest. Empty turns cassettes off.
+CASSETTE_MODE = os.getenv('CASSETTE_MODE', '')
+CASSETTE_PATH = os.getenv('CASSETTE_PATH', 'cassettes/agents.jsonl.gz')
+# 0 replays instantly, 1 with the recorded timing, 2 twice as slow, ...
+CASSETTE_LATENCY = float(os.getenv('CASSETTE_LATENCY', '0'))
+
+# Request fields that don't change the response
+IGNORED_FIELDS = ('user', 'metadata', 'store')
+# Query parameters that carry credentials; they are left out of keys so recordings don't depend on them
+CREDENTIAL_PARAMS = ('key', 'api_key', 'apikey', 'access_token', 'token')
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def request_key(request: httpx.Request) -> str:
+    '''Hash of the method, endpoint, sorted query (minus credentials) and canonical JSON body. The
+    host and base path are left out so a cassette recorded against one base URL replays against
+    another.'''
+    try:
+        body = json.loads(request.content)
+        for field in IGNORED_FIELDS:
+            body.pop(field, None)
+        canonical = json.dumps(body, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    except (ValueError, AttributeError):
+        canonical = request.content.decode('utf-8', 'replace')
+    endpoint = '/'.join(request.url.path.rstrip('/').split('/')[-2:])
+    query = sorted((k, v) for k, v in request.url.params.multi_items() if k.lower() not in CREDENTIAL_PARAMS)
+    if query:
+        endpoint += '?' + str(httpx.QueryParams(query))
+    return hashlib.sha256(f'{request.method} {endpoint} {canonical}'.encode()).hexdigest()[:32]
+
+
+@dataclass
+class Entry:
+    key: str
+    status: int
+    content_type: str
+    body: str
+    ttfb: float
+    duration: float
+
+
+class Cassette:
+    '''Recorded exchanges in a JSONL file (gzipped if the path ends in .gz), one entry per line.
+    The same request recorded several times replays its responses in turn.'''
+
+    def __init__(self, path: str = CASSETTE_PATH):
+        self.path = path
+        self.entries: defaultdict[str, list[Entry]] = defaultdict(list)
+        self.played: Counter[str] = Counter()
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with self._open('rt') as f:
+                for line in f:
+                    if line.strip():
+                        entry = Entry(**json.loads(line))
+                        self.entries[entry.key].append(entry)
+
+    def _open(self, mode: str):
+        if self.path.endswith('.gz'):
+            import gzip
+            return gzip.open(self.path, mode, encoding='utf-8')
+        return open(self.path, mode, encoding='utf-8')
+
+    def find(self, key: str) -> Entry | None:
+        entries = self.entries.get(key)
+        if not entries:
+            self.misses += 1
+            return None
+        entry = entries[self.played[key] % len(entries)]
+        self.played[key] += 1
+        self.replayed += 1
+        return entry
+
+    def add(self, entry: Entry):
+        self.entries[entry.key].append(entry)
+        self.recorded += 1
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Appending to a .gz starts a new gzip member, which gzip.open reads back transparently
+        with self._open('at') as f:
+            f.write(json.dumps(asdict(entry), ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    @property
+    def stats(self) -> dict:
+        return {'entries': sum(map(len, self.entries.values())), 'recorded': self.recorded,
+                'replayed': self.replayed, 'misses': self.misses}
+
+
+_cassettes: dict[str, Cassette] = {}
+
+
+def get_cassette(path: str = CASSETTE_PATH) -> Cassette:
+    '''Return the shared Cassette for a path, loading it once.'''
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+class RecordingStream(httpx.AsyncByteStream):
+    '''Pass a streamed body through and hand the whole of it to `on_done` once it is complete.'''
+
+    def __init__(self, response: httpx.Response, on_done):
+        self.response = response
+        self.on_done = on_done
+
+    async def __aiter__(self):
+        chunks = []
+        async for chunk in self.response.aiter_raw():
+            chunks.append(chunk)
+            yield chunk
+        self.on_done(b''.join(chunks))
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+class ReplayStream(httpx.AsyncByteStream):
+    '''Serve a recorded event stream one server-sent event at a time, `delay` seconds apart.'''
+
+    def __init__(self, body: bytes, delay: float):
+        self.events = [event for event in re.split(rb'(?<=\n\n)', body) if event]
+        self.delay = delay
+
+    async def __aiter__(self):
+        for event in self.events:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield event
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    '''httpx transport that records model traffic to a Cassette or replays it without the network.
+
+    Put it outermost so replayed requests skip rate limiting and retries. 429s and 5xx are never
+    recorded. An unknown request in replay mode raises CassetteMiss.
+    '''
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette, mode: str = CASSETTE_MODE,
+                 latency: float = CASSETTE_LATENCY):
+        if mode not in ('record', 'replay', 'auto'):
+            raise ValueError(f'Unknown cassette mode {mode!r}, use "record", "replay" or "auto"')
+        self.transport = transport
+        self.cassette = cassette
+        self.mode = mode
+        self.latency = latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if self.mode != 'record':
+            entry = self.cassette.find(key)
+            if entry is not None:
+                return await self.replay(entry, request)
+            if self.mode == 'replay':
+                raise CassetteMiss(f'No recording for {request.method} {request.url.path} (key {key}) in {self.cassette.path}')
+        return await self.record(key, request)
+
+    async def replay(self, entry: Entry, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(entry.ttfb * self.latency)
+        headers = {'content-type': entry.content_type}
+        body = entry.body.encode()
+        if 'text/event-stream' in entry.content_type:
+            stream = ReplayStream(body, 0.0)
+            if self.latency and stream.events:
+                stream.delay = (entry.duration - entry.ttfb) * self.latency / len(stream.events)
+            return httpx.Response(entry.status, headers=headers, stream=stream, request=request)
+        return httpx.Response(entry.status, headers=headers, content=body, request=request)
+
+    async def record(self, key: str, request: httpx.Request) -> httpx.Response:
+        # Ask for an unencoded body so the cassette stores plain text
+        request.headers['accept-encoding'] = 'identity'
+        started = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        ttfb = time.monotonic() - started
+
+        content_type = response.headers.get('content-type', 'application/json')
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+        keep = response.status_code != 429 and response.status_code < 500
+
+        if 'text/event-stream' not in content_type:
+            body = await response.aread()
+            if keep:
+                self.cassette.add(Entry(key, response.status_code, content_type, body.decode('utf-8', 'replace'), ttfb, ttfb))
+            return httpx.Response(response.status_code, headers=headers, content=body, request=request,
+                                  extensions=response.extensions)
+
+        def on_done(body: bytes):
+            if keep:
+                self.cassette.add(Entry(key, response.status_code, content_type, body.decode('utf-8', 'replace'),
+                                        ttfb, time.monotonic() - started))
+
+        return httpx.Response(response.status_code, headers=headers, stream=RecordingStream(response, on_done),
+                              request=request, extensions=response.extensions)
+
+    async def aclose(self):
+        await self.transport.aclose()
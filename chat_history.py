@@ -1,34 +1,15 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool, TResponseInputItem
-from agents.run import RunConfig
+from agents import Agent, Runner, function_tool, TResponseInputItem
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 import asyncio
+import sys
+from history import agent_summarizer
+from sessions import SessionStore
 
 
-load_dotenv()
+model = get_model()
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+config = get_run_config()
 
 
 agent = Agent(
@@ -38,21 +19,33 @@ agent = Agent(
 )
 
 
-convo: list[TResponseInputItem] = []
+summarizer_agent = Agent(
+    name='Summarizer',
+    instructions='Summarize the conversation in a few sentences. Keep names, numbers and decisions. Output only the summary.',
+    model=model
+)
 
 
 async def main():
-    global convo
-    while True:
-        user_input = input('User: ')
-        convo.append({ 'content': user_input, 'role': 'user' })
-        result = await Runner.run(agent, convo, run_config=config)
-
-
-        print(f'Ai: {result.final_output}')
-        convo = result.to_input_list()
-        
-        # for message in result.to_input_list():
-        #     print(message)
-
-asyncio.run(main())
\ No newline at end of file
+    session_id = sys.argv[1] if len(sys.argv) > 1 else 'default'
+    store = SessionStore()
+    convo = store.load_history(session_id, max_tokens=4000, summarizer=agent_summarizer(summarizer_agent, config))
+    store.start()
+    try:
+        while True:
+            user_input = await asyncio.to_thread(input, 'User: ')
+            convo.add_user(user_input)
+            result = await Runner.run(agent, convo.to_input(), run_config=config)
+
+
+            print(f'Ai: {result.final_output}')
+            convo.add_result(result)
+            store.append(session_id, convo.turns[-1].items)
+            await convo.compact()
+
+            # print(convo.turn_stats()[-1], convo.tokens)
+    finally:
+        await store.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
\ No newline at end of file
@@ -1,36 +1,15 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, model_settings, ModelSettings, function_tool, RunContextWrapper
-from agents.run import RunConfig
+from agents import Agent, Runner, model_settings, ModelSettings, function_tool, RunContextWrapper
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 from dataclasses import dataclass
+from prompts import PromptTemplate
+from tool_cache import cached_tool
 import random
 
 
-load_dotenv()
+model = get_model()
 
-
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+config = get_run_config()
 
 
 @dataclass
@@ -41,24 +20,29 @@ class UserInfo:
 user_info = UserInfo('Rohaan', 123)
 
 
-@function_tool
+@cached_tool
 async def fetch_user_age(ctx: RunContextWrapper[UserInfo]) -> str:  
     """Fetch the age of the user. Call this function to get user's age information."""
     return f"The user {ctx.context.name} is 47 years old"
 
 
-@dataclass
+@dataclass(frozen=True)
 class CustomInstruction:
     style: str
 
-def custom_instructions(ctx: RunContextWrapper[CustomInstruction], agent: Agent[CustomInstruction]) -> str:
-    context = ctx.context
-    if context.style == "haiku":
-        return "Only respond in haikus."
-    elif context.style == "pirate":
-        return "Respond as a pirate."
-    else:
-        return "Respond as a robot and say 'beep boop' a lot."
+# Rendered once per style. Shared instructions, if these styles ever get any, belong in `prefix`
+# so every style starts with the same prompt bytes.
+custom_instructions = PromptTemplate(
+    variants={
+        'haiku': 'Only respond in haikus.',
+        'pirate': 'Respond as a pirate.',
+        'robot': "Respond as a robot and say 'beep boop' a lot.",
+    },
+    key=lambda context: context.style,
+    default='robot'
+)
+
+styles = {style: CustomInstruction(style) for style in custom_instructions.rendered}
 
 
 agent = Agent[UserInfo](
@@ -70,15 +54,16 @@ agent = Agent[UserInfo](
 
 
 
-while True:
-    user_input = input('User: ')
-    choice = random.choice(['haiku', 'pirate', 'robot'])
-    context = CustomInstruction(choice)
-    result = Runner.run_sync(
-        agent,
-        user_input, 
-        run_config=config,
-        # context=user_info
-        context=context
-    )
-    print(f'Ai: {result.final_output}')
\ No newline at end of file
+if __name__ == '__main__':
+    while True:
+        user_input = input('User: ')
+        choice = random.choice(['haiku', 'pirate', 'robot'])
+        context = styles[choice]
+        result = Runner.run_sync(
+            agent,
+            user_input, 
+            run_config=config,
+            # context=user_info
+            context=context
+        )
+        print(f'Ai: {result.final_output}')
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable
+from agents import Agent, FunctionTool, RunContextWrapper, TResponseInputItem
+from agents.run import RunConfig
+from guardrail_pipeline import run_guarded
+from metrics import metrics
+
+
+FANOUT_CONCURRENCY = int(os.getenv('FANOUT_CONCURRENCY', '4'))
+FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', '30'))
+
+
+@dataclass
+class Branch:
+    name: str
+    output: Any = None
+    error: str | None = None
+    seconds: float = 0.0
+
+
+async def fan_out(agents: dict[str, Agent], input: str | list[TResponseInputItem], *, concurrency: int = FANOUT_CONCURRENCY,
+                  timeout: float | None = FANOUT_TIMEOUT, run_config: RunConfig | None = None, context: Any = None) -> list[Branch]:
+    '''Run every agent on the same input at the same time, at most `concurrency` at once, and
+    return one Branch per agent in the order given. A branch that fails or takes longer than
+    `timeout` seconds (counted from when it starts) is reported with an error instead of
+    failing the others.'''
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def branch(name: str, agent: Agent) -> Branch:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(run_guarded(agent, input, run_config=run_config, context=context), timeout)
+                return Branch(name, result.final_output, seconds=time.perf_counter() - started)
+            except TimeoutError:
+                metrics.inc('fanout_branch_errors_total', branch=name, reason='timeout')
+                return Branch(name, error=f'timed out after {timeout}s', seconds=time.perf_counter() - started)
+            except Exception as e:
+                metrics.inc('fanout_branch_errors_total', branch=name, reason=type(e).__name__)
+                return Branch(name, error=f'{type(e).__name__}: {e}', seconds=time.perf_counter() - started)
+            finally:
+                metrics.observe('fanout_branch_seconds', time.perf_counter() - started, branch=name)
+
+    return list(await asyncio.gather(*(branch(name, agent) for name, agent in agents.items())))
+
+
+def merge_outputs(branches: list[Branch]) -> str:
+    '''One line per branch, e.g. "spanish: Hola", with failed branches marked as such.'''
+    return '\n'.join(f'{b.name}: {b.output}' if b.error is None else f'{b.name}: failed ({b.error})' for b in branches)
+
+
+def fan_out_tool(agents: dict[str, Agent], tool_name: str, tool_description: str, *, concurrency: int = FANOUT_CONCURRENCY,
+                 timeout: float | None = FANOUT_TIMEOUT, run_config: RunConfig | None = None,
+                 merge: Callable[[list[Branch]], str] = merge_outputs) -> FunctionTool:
+    '''Agents-as-tools in one call: the model picks any of the agents by name and they all run
+    in parallel on the same input, so N sub-agents cost the slowest branch instead of the sum of
+    N sequential tool calls. Their outputs are merged into a single tool result.'''
+    names = list(agents)
+    schema = {
+        'type': 'object',
+        'properties': {
+            'input': {'type': 'string', 'description': 'The message every selected agent receives'},
+            'targets': {'type': 'array', 'items': {'type': 'string', 'enum': names},
+                        'description': 'Which agents to run; all of them if empty'},
+        },
+        'required': ['input', 'targets'],
+        'additionalProperties': False,
+    }
+
+    async def invoke(ctx: RunContextWrapper, arguments: str) -> str:
+        args = json.loads(arguments)
+        selected = {name: agents[name] for name in dict.fromkeys(args['targets'] or names) if name in agents}
+        branches = await fan_out(selected, args['input'], concurrency=concurrency, timeout=timeout,
+                                 run_config=run_config, context=ctx.context)
+        return merge(branches)
+
+    return FunctionTool(name=tool_name, description=tool_description, params_json_schema=schema, on_invoke_tool=invoke)
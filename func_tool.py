@@ -1,37 +1,17 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool
-from agents.run import RunConfig
+from agents import Agent, Runner, function_tool
+from tool_cache import cached_tool
+from provider import get_model, get_run_config
 from pydantic import BaseModel
+from calculator import calculate_json
+from tool_exec import pooled_tool
 
 
-load_dotenv()
+model = get_model()
 
+config = get_run_config()
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
-
-
-@function_tool
+@cached_tool
 def add(a: float, b: float) -> float:
     '''
     Adds given two numbers
@@ -45,7 +25,7 @@ def add(a: float, b: float) -> float:
     return a + b
 
 
-@function_tool
+@cached_tool
 def subtract(a: float, b: float) -> float:
     '''
     Subtracts given two numbers
@@ -59,7 +39,7 @@ def subtract(a: float, b: float) -> float:
     return a - b
 
 
-@function_tool
+@cached_tool
 def multiply(a: float, b: float) -> float:
     '''
     Muliplies given two numbers
@@ -73,7 +53,7 @@ def multiply(a: float, b: float) -> float:
     return a * b
 
 
-@function_tool
+@cached_tool
 def divide(a: float, b: float) -> float:
     '''
     Performs division between two numbers
@@ -87,16 +67,31 @@ def divide(a: float, b: float) -> float:
     return a / b
 
 
+# Big powers and long batches are CPU work, so keep them off the event loop
+@pooled_tool(timeout=5)
+def calculate(expressions: list[str]) -> str:
+    '''
+    Evaluates one or more complete arithmetic expressions exactly in a single call
+
+    Args:
+        expressions: expressions such as "(3+4)*5/2" or "2^100". Supports + - * / // % ^, parentheses, sqrt, abs, round, min, max, floor, ceil, log, sin, cos, tan, pi and e
+    '''
+
+    print('calculate tool called')
+    return calculate_json(expressions)
+
+
 calculator_agent = Agent(
     name='Calculator Agent',
-    instructions='You are a calculator Agent. You can only perform calculations and if user asks anything else tell user that you cannot do anything else.',
+    instructions='You are a calculator Agent. You can only perform calculations and if user asks anything else tell user that you cannot do anything else. Write the whole calculation as one expression and pass every expression you need to the calculate tool in a single call. If a result has an error, tell the user what went wrong.',
     model=model,
-    tools=[add, subtract, multiply, divide]
+    tools=[calculate]
 )
 
 
 
-while True:
-    user_input = input('User: ')
-    result = Runner.run_sync(calculator_agent, user_input, run_config=config)
-    print(f'Agent: {result.final_output}')
\ No newline at end of file
+if __name__ == '__main__':
+    while True:
+        user_input = input('User: ')
+        result = Runner.run_sync(calculator_agent, user_input, run_config=config)
+        print(f'Agent: {result.final_output}')
\ No newline at end of file
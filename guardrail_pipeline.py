@@ -0,0 +1,145 @@
+import time
+import asyncio
+import dataclasses
+import functools
+from typing import Any, Callable
+from agents import Agent, Runner, RunResult, RunContextWrapper, GuardrailFunctionOutput, InputGuardrailTripwireTriggered, TResponseInputItem
+from agents.run import RunConfig
+from cache import TTLCache, SemanticIndex
+from metrics import metrics
+
+
+LocalCheck = Callable[[str], GuardrailFunctionOutput | None]
+
+pipeline_stats = {
+    'local_verdicts': 0,
+    'deferred_verdicts': 0,
+    'tripwires': 0,
+    'cancelled_runs': 0,
+}
+
+
+def input_text(input: str | list[TResponseInputItem]) -> str:
+    '''The text of the latest user message, which is what input guardrails judge.'''
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if item.get('role') == 'user':
+            content = item.get('content', '')
+            if isinstance(content, list):
+                content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+            return content
+    return ''
+
+
+def local_first(*checks: LocalCheck):
+    '''Decorate a guardrail function so cheap local checks run before it.
+
+    Each check gets the input text and returns a GuardrailFunctionOutput when it is sure of the
+    verdict, or None to pass. The wrapped (usually LLM based) guardrail only runs if every
+    check passes. Put it under @input_guardrail:
+
+        @input_guardrail
+        @local_first(looks_like_maths)
+        async def my_guardrail(ctx, agent, input): ...
+    '''
+    def decorator(guardrail_function):
+        @functools.wraps(guardrail_function)
+        async def wrapper(ctx: RunContextWrapper, agent: Agent, input: str | list[TResponseInputItem]) -> GuardrailFunctionOutput:
+            text = input_text(input)
+            for check in checks:
+                verdict = check(text)
+                if verdict is not None:
+                    pipeline_stats['local_verdicts'] += 1
+                    return verdict
+
+            pipeline_stats['deferred_verdicts'] += 1
+            return await guardrail_function(ctx, agent, input)
+
+        return wrapper
+
+    return decorator
+
+
+def normalize_input(text: str) -> str:
+    return ' '.join(text.lower().split()).strip(' .?!')
+
+
+def cached_verdict(cache: TTLCache, semantic: SemanticIndex | None = None):
+    '''Decorate a guardrail function so its verdicts are cached by normalized input text.
+
+    Identical inputs (after lowercasing and whitespace/punctuation cleanup) reuse the earlier
+    verdict, and concurrent identical inputs share one call. With a SemanticIndex over the same
+    cache, near-duplicates above its similarity threshold may reuse a tripped verdict, but never
+    a passing one: a close neighbour of an allowed input can still be off-topic. Hit rates are
+    in `cache.stats`. Put it under @input_guardrail (and under @local_first if used).
+    '''
+    def decorator(guardrail_function):
+        @functools.wraps(guardrail_function)
+        async def wrapper(ctx: RunContextWrapper, agent: Agent, input: str | list[TResponseInputItem]) -> GuardrailFunctionOutput:
+            key = normalize_input(input_text(input))
+
+            async def fetch():
+                verdict = await guardrail_function(ctx, agent, input)
+                if semantic is not None:
+                    semantic.add(key, key)
+                return verdict
+
+            def similar():
+                verdict = semantic.lookup(key)
+                if verdict is TTLCache.MISSING or not verdict.tripwire_triggered:
+                    return TTLCache.MISSING
+                return verdict
+
+            return await cache.get_or_fetch(key, fetch, similar if semantic else None)
+
+        return wrapper
+
+    return decorator
+
+
+async def run_guarded(agent: Agent, input: str | list[TResponseInputItem], *, run_config: RunConfig | None = None,
+                      context: Any = None, **kwargs) -> RunResult:
+    '''Runner.run, but the agent starts at the same time as its input guardrails and is cancelled
+    the moment one of them trips.
+
+    Runner.run also overlaps guardrails with the first turn, but a tripwire there leaves the
+    model call (and any tools it triggers) running in the background until it finishes.
+    '''
+    run_config = run_config or RunConfig()
+    guardrails = agent.input_guardrails + (run_config.input_guardrails or [])
+    if not guardrails:
+        return await Runner.run(agent, input, run_config=run_config, context=context, **kwargs)
+
+    unguarded_agent = agent.clone(input_guardrails=[])
+    unguarded_config = dataclasses.replace(run_config, input_guardrails=None)
+    context_wrapper = RunContextWrapper(context=context)
+
+    async def timed(guardrail):
+        started = time.perf_counter()
+        result = await guardrail.run(agent, input, context_wrapper)
+        metrics.observe('guardrail_seconds', time.perf_counter() - started, guardrail=guardrail.get_name())
+        return result
+
+    main = asyncio.create_task(Runner.run(unguarded_agent, input, run_config=unguarded_config, context=context, **kwargs))
+    checks = [asyncio.create_task(timed(guardrail)) for guardrail in guardrails]
+    results = []
+    try:
+        for done in asyncio.as_completed(checks):
+            result = await done
+            if result.output.tripwire_triggered:
+                pipeline_stats['tripwires'] += 1
+                metrics.inc('guardrail_tripwires_total', guardrail=result.guardrail.get_name())
+                if not main.done():
+                    pipeline_stats['cancelled_runs'] += 1
+                raise InputGuardrailTripwireTriggered(result)
+            results.append(result)
+
+        run_result = await main
+    finally:
+        for task in [main, *checks]:
+            task.cancel()
+        await asyncio.gather(main, *checks, return_exceptions=True)
+
+    run_result.input_guardrail_results = results
+    return run_result
@@ -1,34 +1,17 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool, handoff, RunContextWrapper, input_guardrail, output_guardrail, GuardrailFunctionOutput, InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
-from agents.run import RunConfig
+from agents import Agent, Runner, function_tool, handoff, RunContextWrapper, input_guardrail, output_guardrail, GuardrailFunctionOutput, InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 from agents.extensions import handoff_filters
+import os
 import asyncio
+from guardrail_pipeline import local_first, cached_verdict, run_guarded
+from cache import TTLCache, SemanticIndex
+from router import ARITHMETIC_PATTERN
 
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
+model = get_model()
 
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+config = get_run_config()
 
 
 class MathsQueryDetectorOutput(BaseModel):
@@ -58,7 +41,29 @@ async def validate_numeric_output(ctx: RunContextWrapper, agent: Agent, output:
     )
 
 
+# Only input that is nothing but an arithmetic expression, e.g. "what is 12 * 7?", is clearly on-topic
+# and skips the LLM check. Maths words and digit ranges also show up in off-topic questions, so anything
+# else goes to the detector agent.
+def looks_like_maths(text: str) -> GuardrailFunctionOutput | None:
+    if ARITHMETIC_PATTERN.match(text):
+        return GuardrailFunctionOutput(
+            tripwire_triggered=False,
+            output_info=MathsQueryDetectorOutput(is_not_maths_query=False, explanation='Matched local maths rule')
+        )
+    return None
+
+
+# Near-duplicate reuse of tripped verdicts is opt-in. Below about 0.95, hashed trigram similarity
+# matches different questions, e.g. "pythagorean theorem" vs "pythagorean empire" score 0.83.
+GUARDRAIL_SIMILARITY = os.getenv('GUARDRAIL_SIMILARITY', '')
+
+verdict_cache = TTLCache(maxsize=2048, ttl=3600)
+similar_verdicts = SemanticIndex(verdict_cache, threshold=float(GUARDRAIL_SIMILARITY)) if GUARDRAIL_SIMILARITY else None
+
+
 @input_guardrail
+@local_first(looks_like_maths)
+@cached_verdict(verdict_cache, similar_verdicts)
 async def not_maths_homework_detection_guardrail(ctx: RunContextWrapper[None], agent: Agent, input: str | list) -> GuardrailFunctionOutput:
     detection_result = await Runner.run(maths_detector_guardrail_agent, input, run_config=config)
 
@@ -80,7 +85,7 @@ math_homework_agent = Agent(
 async def main():
     try:
         user_input = input('User: ')
-        result = await Runner.run(math_homework_agent, user_input, run_config=config)
+        result = await run_guarded(math_homework_agent, user_input, run_config=config)
         # print('Guardrail not triggered')
         print(f'Response: {result.final_output}')
     except InputGuardrailTripwireTriggered as e:
@@ -1,42 +1,26 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool, handoff, RunContextWrapper
-from agents.run import RunConfig
+from agents import Agent, Runner, function_tool, handoff, RunContextWrapper
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 from agents.extensions import handoff_filters
+from router import PreRouter, arithmetic_rule, keyword_rule
+from handoff_compaction import chain, drop_triage_messages, keep_last_turns
+from speculation import SPECULATE, SpeculativeRouter
 
 
 
-load_dotenv()
+model = get_model()
 
-
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+config = get_run_config()
 
 class Problems(BaseModel):
     user_question: str
     topic: str
 
 
+# Specialists only need the user's question and the Problems payload in the handoff call
+specialist_input = chain(drop_triage_messages(), keep_last_turns(1))
+
+
 def on_handoff(ctx: RunContextWrapper, input_data: Problems):
     print(f'\nUser Question: {input_data.user_question}\n')
     print(f'\nTopic: {input_data.topic}\n')
@@ -61,13 +45,30 @@ triage_agent = Agent(
     instructions='You are a teaching assistant. You handoff user request to corresponding agent if present. If such agent is not present to handoff, you simply tell user what queries you can answer.',
     model=model,
     handoffs=[
-        handoff(agent=maths_agent, input_type=Problems, on_handoff=on_handoff, input_filter=handoff_filters.remove_all_tools),
-        handoff(agent=history_agent, input_type=Problems, on_handoff=on_handoff)
+        handoff(agent=maths_agent, input_type=Problems, on_handoff=on_handoff, input_filter=specialist_input),
+        handoff(agent=history_agent, input_type=Problems, on_handoff=on_handoff, input_filter=specialist_input)
     ]
 )
 
+router = PreRouter(
+    triage_agent,
+    targets={'maths': maths_agent, 'history': history_agent},
+    rules=[
+        arithmetic_rule('maths'),
+        # Everyday words ("solve", "war", "king", "queen") are left to the triage agent
+        keyword_rule('maths', r'equation|calculate|integral|derivative|algebra|geometry|fraction|theorem|square root'),
+        keyword_rule('history', r'history|historical|century|empire|dynasty|revolution|ancient|medieval|emperor|pharaoh'),
+    ]
+)
+
+speculative_router = SpeculativeRouter(router)
+
 
-user_input = input('Input: ')
-result = Runner.run_sync(triage_agent, user_input, run_config=config)
+if __name__ == '__main__':
+    user_input = input('Input: ')
+    if SPECULATE:
+        result = speculative_router.run_sync(user_input, run_config=config)
+    else:
+        result = Runner.run_sync(router.pick(user_input), user_input, run_config=config)
 
-print('Agent: ', result.final_output)
\ No newline at end of file
+    print('Agent: ', result.final_output)
\ No newline at end of file
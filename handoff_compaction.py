@@ -0,0 +1,146 @@
+import functools
+from typing import Callable
+from agents import HandoffCallItem, HandoffInputData, HandoffOutputItem, RunItem, TResponseInputItem
+from history import SUMMARY_PREFIX, estimate_tokens, is_user_message, item_text
+from metrics import metrics
+
+
+HandoffInputFilter = Callable[[HandoffInputData], HandoffInputData]
+
+# Per filter: calls, tokens seen, tokens removed
+filter_stats: dict[str, dict[str, int]] = {}
+
+
+def handoff_tokens(data: HandoffInputData) -> int:
+    '''Estimated prompt tokens the receiving agent would be sent for this handoff input.'''
+    history = data.input_history
+    tokens = estimate_tokens({'content': history, 'role': 'user'}) if isinstance(history, str) else sum(map(estimate_tokens, history))
+    return tokens + sum(estimate_tokens(item.to_input_item()) for item in (*data.pre_handoff_items, *data.new_items))
+
+
+def reports_tokens(name: str):
+    '''Decorate a handoff input filter so the tokens it removes are counted under `name`, both in
+    `filter_stats` and as the handoff_tokens_removed_total metric.'''
+    def decorator(input_filter: HandoffInputFilter) -> HandoffInputFilter:
+        @functools.wraps(input_filter)
+        def wrapper(data: HandoffInputData) -> HandoffInputData:
+            before = handoff_tokens(data)
+            filtered = input_filter(data)
+            removed = before - handoff_tokens(filtered)
+
+            stats = filter_stats.setdefault(name, {'calls': 0, 'tokens_in': 0, 'tokens_removed': 0})
+            stats['calls'] += 1
+            stats['tokens_in'] += before
+            stats['tokens_removed'] += removed
+            metrics.inc('handoff_tokens_removed_total', removed, filter=name)
+            return filtered
+
+        return wrapper
+
+    return decorator
+
+
+def split_turns(items: tuple[TResponseInputItem, ...]) -> list[list[TResponseInputItem]]:
+    '''Group items into turns that each start at a user message, like ConversationHistory. Items
+    before the first user message (e.g. a summary) form a turn of their own.'''
+    turns: list[list[TResponseInputItem]] = []
+    for item in items:
+        if is_user_message(item) or not turns:
+            turns.append([])
+        turns[-1].append(item)
+    return turns
+
+
+def _with_history(data: HandoffInputData, turns: list[list[TResponseInputItem]]) -> HandoffInputData:
+    return HandoffInputData(
+        input_history=tuple(item for turn in turns for item in turn),
+        pre_handoff_items=data.pre_handoff_items,
+        new_items=data.new_items,
+    )
+
+
+def keep_last_turns(n: int = 1) -> HandoffInputFilter:
+    '''Send only the last `n` turns of the conversation history.'''
+    @reports_tokens(f'keep_last_turns({n})')
+    def keep_last_turns_filter(data: HandoffInputData) -> HandoffInputData:
+        if isinstance(data.input_history, str):
+            return data
+        return _with_history(data, split_turns(data.input_history)[-n:])
+
+    return keep_last_turns_filter
+
+
+def drop_triage_messages(keep_handoff: bool = True) -> HandoffInputFilter:
+    '''Drop what the handing-off agent produced during this run: its messages, tool calls and
+    their outputs. With `keep_handoff`, the handoff call and its output stay, since the call's
+    arguments carry the structured payload (e.g. Problems) for the receiving agent.
+
+    The receiving agent hasn't run yet, so everything generated so far belongs to the triage
+    side. Note the SDK also leaves dropped items out of the run's new_items.
+    '''
+    def keep(item: RunItem) -> bool:
+        return keep_handoff and isinstance(item, (HandoffCallItem, HandoffOutputItem))
+
+    @reports_tokens('drop_triage_messages')
+    def drop_triage_messages_filter(data: HandoffInputData) -> HandoffInputData:
+        return HandoffInputData(
+            input_history=data.input_history,
+            pre_handoff_items=tuple(filter(keep, data.pre_handoff_items)),
+            new_items=tuple(filter(keep, data.new_items)),
+        )
+
+    return drop_triage_messages_filter
+
+
+def digest(items: list[TResponseInputItem], line_chars: int = 160) -> str:
+    '''Local stand-in for an LLM summary: one truncated line per message. Handoff filters run
+    synchronously inside the SDK, so there is no chance to await a summarizer agent here.'''
+    lines = []
+    for item in items:
+        text = item_text(item)
+        if text.startswith(f'system: {SUMMARY_PREFIX}'):
+            text = text[len('system: '):]
+        lines.append(text if len(text) <= line_chars else text[:line_chars - 1] + '…')
+    return ' | '.join(lines)
+
+
+def summarize_older(keep_last: int = 2, summarize: Callable[[list[TResponseInputItem]], str] = digest) -> HandoffInputFilter:
+    '''Fold every turn before the last `keep_last` into one system summary message.'''
+    @reports_tokens(f'summarize_older({keep_last})')
+    def summarize_older_filter(data: HandoffInputData) -> HandoffInputData:
+        if isinstance(data.input_history, str):
+            return data
+        turns = split_turns(data.input_history)
+        if len(turns) <= keep_last:
+            return data
+        older = [item for turn in turns[:-keep_last] for item in turn]
+        summary = {'content': SUMMARY_PREFIX + summarize(older), 'role': 'system'}
+        return _with_history(data, [[summary], *turns[-keep_last:]])
+
+    return summarize_older_filter
+
+
+def token_budget(max_tokens: int) -> HandoffInputFilter:
+    '''Drop the oldest history turns until the handoff input fits `max_tokens`. The newest turn is
+    always kept, so a single oversized turn can still exceed the budget.'''
+    @reports_tokens(f'token_budget({max_tokens})')
+    def token_budget_filter(data: HandoffInputData) -> HandoffInputData:
+        if isinstance(data.input_history, str):
+            return data
+        turns = split_turns(data.input_history)
+        total = handoff_tokens(data)
+        while len(turns) > 1 and total > max_tokens:
+            total -= sum(map(estimate_tokens, turns.pop(0)))
+        return _with_history(data, turns)
+
+    return token_budget_filter
+
+
+def chain(*filters: HandoffInputFilter) -> HandoffInputFilter:
+    '''Apply several handoff input filters in order.'''
+    def chained(data: HandoffInputData) -> HandoffInputData:
+        for input_filter in filters:
+            data = input_filter(data)
+        return data
+
+    return chained
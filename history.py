@@ -0,0 +1,139 @@
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable
+from agents import Agent, Runner, RunResult, TResponseInputItem
+from agents.run import RunConfig
+
+
+Summarizer = Callable[[str | None, list[TResponseInputItem]], Awaitable[str]]
+
+SUMMARY_PREFIX = 'Summary of the earlier conversation: '
+
+
+def item_bytes(item: TResponseInputItem) -> int:
+    return len(json.dumps(item, ensure_ascii=False, default=str).encode())
+
+
+def estimate_tokens(item: TResponseInputItem) -> int:
+    # Roughly 4 bytes per token for English text; good enough for budgeting without a tokenizer
+    return math.ceil(item_bytes(item) / 4)
+
+
+def item_text(item: TResponseInputItem) -> str:
+    '''Flatten an input item into a single line of text, e.g. for summarizing.'''
+    if item.get('type') == 'function_call':
+        return f"tool call {item.get('name')}({item.get('arguments')})"
+    if item.get('type') == 'function_call_output':
+        return f"tool output: {item.get('output')}"
+
+    content = item.get('content', '')
+    if isinstance(content, list):
+        content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return f"{item.get('role', 'assistant')}: {content}"
+
+
+def is_user_message(item: TResponseInputItem) -> bool:
+    return item.get('role') == 'user' and item.get('type', 'message') == 'message'
+
+
+@dataclass
+class Turn:
+    '''One user message plus everything the agent produced in reply to it.
+
+    Tool calls and their outputs always live in the same turn, so dropping whole turns can never
+    leave an orphaned call or output behind.
+    '''
+    items: list[TResponseInputItem] = field(default_factory=list)
+    tokens: int = 0
+    bytes: int = 0
+
+    def add(self, item: TResponseInputItem):
+        self.items.append(item)
+        self.tokens += estimate_tokens(item)
+        self.bytes += item_bytes(item)
+
+
+class ConversationHistory:
+    '''Conversation transcript kept under a token budget.
+
+    Items are grouped into turns as they arrive and their sizes are counted once. When the total
+    goes over `max_tokens` the oldest turns are dropped, or folded into a running summary message
+    when a summarizer is given. The newest turn is always kept.
+    '''
+
+    def __init__(self, max_tokens: int = 4000, summarizer: Summarizer | None = None):
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.turns: list[Turn] = []
+        self.summary: str | None = None
+        self.summary_tokens = 0
+        self.dropped_turns = 0
+
+    @property
+    def tokens(self) -> int:
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    @property
+    def bytes(self) -> int:
+        return sum(turn.bytes for turn in self.turns)
+
+    def add_items(self, items: Iterable[TResponseInputItem]):
+        for item in items:
+            if is_user_message(item) or not self.turns:
+                self.turns.append(Turn())
+            self.turns[-1].add(item)
+
+    def add_user(self, content: str):
+        self.add_items([{'content': content, 'role': 'user'}])
+
+    def add_result(self, result: RunResult):
+        '''Append only the items the run generated, instead of the whole to_input_list().'''
+        self.add_items(item.to_input_item() for item in result.new_items)
+
+    def to_input(self) -> list[TResponseInputItem]:
+        items = []
+        if self.summary:
+            items.append({'content': SUMMARY_PREFIX + self.summary, 'role': 'system'})
+        for turn in self.turns:
+            items.extend(turn.items)
+        return items
+
+    def _pop_over_budget(self) -> list[Turn]:
+        dropped = []
+        while len(self.turns) > 1 and self.tokens > self.max_tokens:
+            dropped.append(self.turns.pop(0))
+        self.dropped_turns += len(dropped)
+        return dropped
+
+    def trim(self) -> int:
+        '''Drop the oldest turns until the history fits the budget. Returns tokens removed.'''
+        return sum(turn.tokens for turn in self._pop_over_budget())
+
+    async def compact(self) -> int:
+        '''Like trim, but older turns are summarized when a summarizer is set. Returns tokens removed.'''
+        dropped = self._pop_over_budget()
+        if not dropped:
+            return 0
+
+        removed = sum(turn.tokens for turn in dropped)
+        if self.summarizer is not None:
+            items = [item for turn in dropped for item in turn.items]
+            self.summary = await self.summarizer(self.summary, items)
+            self.summary_tokens = estimate_tokens({'content': SUMMARY_PREFIX + self.summary, 'role': 'system'})
+        return removed
+
+    def turn_stats(self) -> list[dict]:
+        return [{'items': len(turn.items), 'tokens': turn.tokens, 'bytes': turn.bytes} for turn in self.turns]
+
+
+def agent_summarizer(agent: Agent, run_config: RunConfig | None = None) -> Summarizer:
+    '''Build a summarizer that asks `agent` to fold dropped turns into the running summary.'''
+    async def summarize(previous: str | None, items: list[TResponseInputItem]) -> str:
+        prompt = '\n'.join(item_text(item) for item in items)
+        if previous:
+            prompt = f'Existing summary: {previous}\n\nNew messages:\n{prompt}'
+        result = await Runner.run(agent, prompt, run_config=run_config)
+        return str(result.final_output)
+
+    return summarize
@@ -1,33 +1,20 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel
-from agents.run import RunConfig
+from agents import Agent, Runner, ModelSettings
+from provider import get_model, get_run_config
 from pydantic import BaseModel
+from router import PreRouter, calculator_translator_rules
+from handoff_compaction import chain, drop_triage_messages, summarize_older, token_budget
+from speculation import SPECULATE, SpeculativeRouter
 
 
-load_dotenv()
+model = get_model()
 
-
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
+config = get_run_config(
+    # Calculator and translator questions repeat a lot, so identical calls are answered from cache.
+    # Only deterministic calls are cached, hence temperature 0.
+    ModelSettings(temperature=0),
+    model_cache='exact',
+    # Specialists don't need the triage chatter, and long conversations are folded and capped before a handoff
+    handoff_input_filter=chain(drop_triage_messages(), summarize_older(keep_last=2), token_budget(2000))
 )
 
 class AgentOutput(BaseModel):
@@ -55,19 +42,32 @@ triage_agent = Agent(
     handoffs=[calculator_agent, translator_agent]
 )
 
+router = PreRouter(
+    triage_agent,
+    targets={'calculator': calculator_agent, 'translator': translator_agent},
+    rules=calculator_translator_rules()
+)
 
-
-while True:
-    user_input = input('User: ')
-    result = Runner.run_sync(
-        triage_agent,
-        user_input, 
-        run_config=config, 
-        # max_turns=2
-    )
-
-    if isinstance(result.final_output, AgentOutput):
-        print(f'{result.final_output.agent_name}: {result.final_output.response}\n')
-    else:
-        # Raw response from triage agent itself
-        print(f'Main Agent: {result.final_output}')
\ No newline at end of file
+# SPECULATE=1 starts the likely specialist alongside triage, for lower latency at some token cost
+speculative_router = SpeculativeRouter(router)
+
+
+
+if __name__ == '__main__':
+    while True:
+        user_input = input('User: ')
+        if SPECULATE:
+            result = speculative_router.run_sync(user_input, run_config=config)
+        else:
+            result = Runner.run_sync(
+                router.pick(user_input),
+                user_input, 
+                run_config=config, 
+                # max_turns=2
+            )
+
+        if isinstance(result.final_output, AgentOutput):
+            print(f'{result.final_output.agent_name}: {result.final_output.response}\n')
+        else:
+            # Raw response from triage agent itself
+            print(f'Main Agent: {result.final_output}')
\ No newline at end of file
@@ -0,0 +1,267 @@
+import os
+import time
+import bisect
+import weakref
+import threading
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Callable
+from agents import Agent, Model, RunContextWrapper, RunHooks, Tool
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+METRICS_PORT = os.getenv('METRICS_PORT')
+METRICS_PATH = os.getenv('METRICS_PATH')
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', '15'))
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    '''Cumulative-bucket histogram in the Prometheus style.'''
+
+    def __init__(self, buckets: tuple[float, ...] = SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total, out = 0, []
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = [*labels, extra] if extra else labels
+    if not pairs:
+        return ''
+    escape = lambda value: value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    '''Histograms, counters and gauges exported in the Prometheus text format.
+
+    Observations come from the event loop while exporters read from their own threads, so
+    everything goes through one lock. Gauges are read from collectors at export time.
+    '''
+
+    def __init__(self, prefix: str = 'agents'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms: dict[str, dict[Labels, Histogram]] = defaultdict(dict)
+        self.counters: dict[str, dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.collectors: list[Callable[[], dict[str, float]]] = []
+
+    def observe(self, name: str, value: float, buckets: tuple[float, ...] = SECONDS_BUCKETS, **labels):
+        key = _labels(labels)
+        with self.lock:
+            series = self.histograms[name]
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            self.counters[name][_labels(labels)] += value
+
+    def add_collector(self, collector: Callable[[], dict[str, float]]):
+        '''Register a function returning {gauge_name: value}, called on every export.'''
+        self.collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'histograms': {f'{name}{_format_labels(key)}': {'count': h.count, 'sum': h.sum}
+                               for name, series in self.histograms.items() for key, h in series.items()},
+                'counters': {f'{name}{_format_labels(key)}': value
+                             for name, series in self.counters.items() for key, value in series.items()},
+            }
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                full = f'{self.prefix}_{name}'
+                lines.append(f'# TYPE {full} histogram')
+                for key, histogram in series.items():
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{full}_bucket{_format_labels(key, ("le", bound))} {total}')
+                    lines.append(f'{full}_sum{_format_labels(key)} {histogram.sum}')
+                    lines.append(f'{full}_count{_format_labels(key)} {histogram.count}')
+            for name, series in sorted(self.counters.items()):
+                full = f'{self.prefix}_{name}'
+                lines.append(f'# TYPE {full} counter')
+                for key, value in series.items():
+                    lines.append(f'{full}{_format_labels(key)} {value}')
+
+        for collector in self.collectors:
+            for name, value in collector().items():
+                lines.append(f'# TYPE {self.prefix}_{name} gauge')
+                lines.append(f'{self.prefix}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path: str):
+        '''Write the current metrics atomically, e.g. for node_exporter's textfile collector.'''
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> 'ThreadingHTTPServer':
+        '''Serve GET /metrics from a daemon thread.'''
+        # Imported here so processes that never serve metrics don't pay for http.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+    def export_periodically(self, path: str, interval: float = METRICS_INTERVAL) -> threading.Event:
+        '''Rewrite `path` every `interval` seconds from a daemon thread. Set the returned event to stop.'''
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                self.write_file(path)
+            self.write_file(path)
+
+        threading.Thread(target=loop, name='metrics-file', daemon=True).start()
+        return stop
+
+
+metrics = MetricsRegistry()
+
+
+def start_exporters(registry: MetricsRegistry = metrics):
+    '''Start the exporters configured by METRICS_PORT and METRICS_PATH, if any.'''
+    if METRICS_PORT:
+        registry.serve(int(METRICS_PORT))
+    if METRICS_PATH:
+        registry.export_periodically(METRICS_PATH)
+
+
+class MetricsHooks(RunHooks):
+    '''RunHooks that time every agent, tool and handoff of a run and record its token usage.
+
+    `agent_seconds` is how long an agent was in charge: from its start to its handoff or final
+    output, so a slow triage hop shows up as time on the triage agent. Pass one instance to any
+    number of concurrent runs: `Runner.run(agent, input, hooks=MetricsHooks())`.
+    '''
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self._runs: dict[int, dict] = {}
+
+    def _run(self, context: RunContextWrapper) -> dict:
+        # Keyed by the run's context wrapper and forgotten with it, so failed runs don't leak
+        key = id(context)
+        if key not in self._runs:
+            self._runs[key] = {'agents': {}, 'tools': defaultdict(list)}
+            weakref.finalize(context, self._runs.pop, key, None)
+        return self._runs[key]
+
+    def _agent_done(self, context: RunContextWrapper, agent: Agent):
+        started = self._run(context)['agents'].pop(agent.name, None)
+        if started is not None:
+            self.registry.observe('agent_seconds', time.perf_counter() - started, agent=agent.name)
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent) -> None:
+        self._run(context)['agents'][agent.name] = time.perf_counter()
+
+    async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: Any) -> None:
+        self._agent_done(context, agent)
+        usage = context.usage
+        self.registry.observe('run_input_tokens', usage.input_tokens, TOKEN_BUCKETS, agent=agent.name)
+        self.registry.observe('run_output_tokens', usage.output_tokens, TOKEN_BUCKETS, agent=agent.name)
+        self.registry.observe('run_model_calls', usage.requests, (1, 2, 3, 5, 8, 13, 21), agent=agent.name)
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent) -> None:
+        self._agent_done(context, from_agent)
+        self.registry.inc('handoffs_total', source=from_agent.name, target=to_agent.name)
+
+    async def on_tool_start(self, context: RunContextWrapper, agent: Agent, tool: Tool) -> None:
+        self._run(context)['tools'][tool.name].append(time.perf_counter())
+
+    async def on_tool_end(self, context: RunContextWrapper, agent: Agent, tool: Tool, result: str) -> None:
+        # Hooks don't say which call ended, so parallel calls of one tool are paired in start order
+        starts = self._run(context)['tools'][tool.name]
+        if starts:
+            self.registry.observe('tool_seconds', time.perf_counter() - starts.pop(0), tool=tool.name)
+
+
+class InstrumentedModel(Model):
+    '''Model wrapper recording call latency, time to first token (streamed calls only) and
+    token usage per model. Non-streamed calls have no first-token signal.'''
+
+    def __init__(self, model: Model, name: str, registry: MetricsRegistry = metrics):
+        self.model = model
+        self.name = name
+        self.registry = registry
+
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        output_tokens = getattr(usage, 'output_tokens', 0) or 0
+        self.registry.observe('model_input_tokens', input_tokens, TOKEN_BUCKETS, model=self.name)
+        self.registry.observe('model_output_tokens', output_tokens, TOKEN_BUCKETS, model=self.name)
+
+    async def get_response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.model.get_response(*args, **kwargs)
+        except Exception as e:
+            self.registry.inc('model_errors_total', model=self.name, error=type(e).__name__)
+            raise
+        self.registry.observe('model_call_seconds', time.perf_counter() - started, model=self.name, stream='false')
+        self._record_usage(response.usage)
+        return response
+
+    async def stream_response(self, *args, **kwargs):
+        started = time.perf_counter()
+        first_token = None
+        try:
+            async for event in self.model.stream_response(*args, **kwargs):
+                if first_token is None and event.type in ('response.output_text.delta', 'response.function_call_arguments.delta'):
+                    first_token = time.perf_counter() - started
+                    self.registry.observe('time_to_first_token_seconds', first_token, model=self.name)
+                if event.type == 'response.completed':
+                    self._record_usage(event.response.usage)
+                yield event
+        except Exception as e:
+            self.registry.inc('model_errors_total', model=self.name, error=type(e).__name__)
+            raise
+        self.registry.observe('model_call_seconds', time.perf_counter() - started, model=self.name, stream='true')
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from dataclasses import dataclass
+
+
+MOCK_LATENCY = float(os.getenv('MOCK_LATENCY', '0'))
+MOCK_TOKENS_PER_SECOND = float(os.getenv('MOCK_TOKENS_PER_SECOND', '0'))
+MOCK_REPLY_TOKENS = int(os.getenv('MOCK_REPLY_TOKENS', '20'))
+
+FILLER = 'the quick brown fox jumps over the lazy dog'.split()
+
+
+@dataclass
+class Rule:
+    '''Reply with `content` when `match` is found in the system prompt or the last user message.'''
+    match: str
+    content: str
+
+
+def load_script(path: str) -> list[Rule]:
+    with open(path, encoding='utf-8') as f:
+        return [Rule(**rule) for rule in json.load(f)]
+
+
+def filler(tokens: int) -> str:
+    return ' '.join(itertools.islice(itertools.cycle(FILLER), max(tokens, 1)))
+
+
+def schema_instance(schema: dict, defs: dict, text: str):
+    '''Smallest value that validates against a JSON schema, with `text` for every string.'''
+    if '$ref' in schema:
+        return schema_instance(defs[schema['$ref'].split('/')[-1]], defs, text)
+    if 'anyOf' in schema:
+        return schema_instance(schema['anyOf'][0], defs, text)
+    kind = schema.get('type')
+    if kind == 'object':
+        return {name: schema_instance(prop, defs, text) for name, prop in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [schema_instance(schema.get('items', {}), defs, text)]
+    if kind == 'string':
+        return schema['enum'][0] if 'enum' in schema else text
+    if kind in ('integer', 'number'):
+        return 1
+    if kind == 'boolean':
+        return False
+    return None
+
+
+class MockChatServer:
+    '''OpenAI compatible /v1/chat/completions server that replays scripted replies, for benchmarks
+    and offline runs.
+
+    Without a matching rule it behaves like a cooperative model: if tools are offered and the last
+    message is not a tool result it calls one (a handoff tool first, if any), otherwise it answers
+    with filler text, or with a schema-valid object when a JSON schema response format is asked
+    for. Replies start after `latency` seconds and stream at `tokens_per_second` (0 = instantly).
+    '''
+
+    def __init__(self, latency: float = MOCK_LATENCY, tokens_per_second: float = MOCK_TOKENS_PER_SECOND,
+                 reply_tokens: int = MOCK_REPLY_TOKENS, rules: list[Rule] | None = None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.rules = [(re.compile(rule.match, re.IGNORECASE), rule.content) for rule in rules or []]
+        self.ids = itertools.count(1)
+        self.requests = 0
+        self.server: asyncio.Server | None = None
+
+    def reply(self, body: dict) -> tuple[str | None, list[dict]]:
+        '''Content and tool calls for a request.'''
+        messages = body.get('messages', [])
+        last = messages[-1] if messages else {}
+        tools = [tool['function']['name'] for tool in body.get('tools') or []]
+
+        if tools and last.get('role') != 'tool':
+            name = next((tool for tool in tools if tool.startswith('transfer_to_')), tools[0])
+            schema = next(tool['function'].get('parameters') or {} for tool in body['tools'] if tool['function']['name'] == name)
+            # '1' keeps string arguments valid for most tools, e.g. an expression for the calculator
+            arguments = schema_instance(schema, schema.get('$defs', {}), '1') or {}
+            return None, [{'id': f'call_{next(self.ids)}', 'type': 'function',
+                           'function': {'name': name, 'arguments': json.dumps(arguments)}}]
+
+        system = ' '.join(str(m.get('content', '')) for m in messages if m.get('role') == 'system')
+        user = next((str(m.get('content', '')) for m in reversed(messages) if m.get('role') == 'user'), '')
+        for pattern, content in self.rules:
+            if pattern.search(system) or pattern.search(user):
+                return content, []
+
+        response_format = body.get('response_format') or {}
+        if response_format.get('type') == 'json_schema':
+            schema = response_format['json_schema']['schema']
+            return json.dumps(schema_instance(schema, schema.get('$defs', {}), filler(self.reply_tokens))), []
+        return filler(self.reply_tokens), []
+
+    def pace(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def completion(self, body: dict, content: str | None, tool_calls: list[dict], usage: dict) -> dict:
+        message = {'role': 'assistant', 'content': content}
+        if tool_calls:
+            message['tool_calls'] = tool_calls
+        return {'id': f'mock-{next(self.ids)}', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': body.get('model', 'mock'), 'usage': usage,
+                'choices': [{'index': 0, 'message': message, 'finish_reason': 'tool_calls' if tool_calls else 'stop'}]}
+
+    def chunks(self, body: dict, content: str | None, tool_calls: list[dict], usage: dict):
+        base = {'id': f'mock-{next(self.ids)}', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': body.get('model', 'mock')}
+        chunk = lambda delta, finish=None: {**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+
+        yield chunk({'role': 'assistant', 'content': ''})
+        if content:
+            for token in re.findall(r'\S+\s*', content) or [content]:
+                yield chunk({'content': token})
+        for index, call in enumerate(tool_calls):
+            yield chunk({'tool_calls': [{'index': index, **call}]})
+        yield chunk({}, 'tool_calls' if tool_calls else 'stop')
+        yield {**base, 'choices': [], 'usage': usage}
+
+    async def respond(self, body: dict, writer: asyncio.StreamWriter):
+        content, tool_calls = self.reply(body)
+        completion_tokens = len((content or '').split()) + sum(len(call['function']['arguments']) // 4 for call in tool_calls)
+        prompt_tokens = len(json.dumps(body.get('messages', []))) // 4
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+        await asyncio.sleep(self.latency)
+
+        if not body.get('stream'):
+            await asyncio.sleep(self.pace(completion_tokens))
+            data = json.dumps(self.completion(body, content, tool_calls, usage)).encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         + f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+            await writer.drain()
+            return
+
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n')
+        delay = self.pace(1)
+        for chunk in [*self.chunks(body, content, tool_calls, usage), '[DONE]']:
+            data = f'data: {chunk if isinstance(chunk, str) else json.dumps(chunk)}\n\n'.encode()
+            writer.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while request_line := await reader.readline():
+                method, path, _ = request_line.decode('latin-1').split()
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    key, value = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', '0'))
+                body = await reader.readexactly(length) if length else b''
+
+                if method != 'POST' or not path.endswith('/chat/completions'):
+                    writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n')
+                    await writer.drain()
+                    continue
+
+                self.requests += 1
+                await self.respond(json.loads(body), writer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8799) -> asyncio.Server:
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve scripted chat completions for offline runs and benchmarks.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency', type=float, default=MOCK_LATENCY, help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=MOCK_TOKENS_PER_SECOND, help='0 sends every token at once')
+    parser.add_argument('--reply-tokens', type=int, default=MOCK_REPLY_TOKENS, help='length of generated replies in words')
+    parser.add_argument('--script', help='JSON list of {"match": regex, "content": reply} rules')
+    args = parser.parse_args()
+
+    async def main():
+        mock = MockChatServer(args.latency, args.tokens_per_second, args.reply_tokens,
+                              load_script(args.script) if args.script else None)
+        server = await mock.start(args.host, args.port)
+        print(f'Mock chat completions on http://{args.host}:{args.port}/v1/', flush=True)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
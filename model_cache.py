@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import hashlib
+import dataclasses
+from collections import OrderedDict
+from agents import Model, ModelResponse, ModelSettings, Usage
+from cache import TTLCache, SemanticIndex
+from guardrail_pipeline import input_text, normalize_input
+
+
+# '' (off), 'exact' or 'semantic'
+MODEL_CACHE = os.getenv('MODEL_CACHE', '')
+MODEL_CACHE_SIZE = int(os.getenv('MODEL_CACHE_SIZE', '1024'))
+MODEL_CACHE_TTL = float(os.getenv('MODEL_CACHE_TTL', '3600'))
+MODEL_CACHE_THRESHOLD = float(os.getenv('MODEL_CACHE_THRESHOLD', '0.92'))
+# Also cache calls made with temperature > 0, whose answers are meant to vary
+MODEL_CACHE_SAMPLED = os.getenv('MODEL_CACHE_SAMPLED', '0') == '1'
+
+NUMBER = re.compile(r'\d+(?:[.,]\d+)*')
+
+
+def _hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(',', ':'), default=str).encode()).hexdigest()
+
+
+def request_context(model: str, system_instructions, model_settings: ModelSettings, tools, output_schema, handoffs) -> dict:
+    '''Everything about a model call except its input, in a canonical JSON-able form.'''
+    return {
+        'model': model,
+        'instructions': system_instructions,
+        'settings': {k: v for k, v in dataclasses.asdict(model_settings).items() if v is not None},
+        'tools': [{'name': tool.name, 'description': getattr(tool, 'description', None),
+                   'parameters': getattr(tool, 'params_json_schema', None)} for tool in tools],
+        'output_schema': output_schema.json_schema() if output_schema and not output_schema.is_plain_text() else None,
+        'handoffs': [{'name': handoff.tool_name, 'description': handoff.tool_description,
+                      'parameters': handoff.input_json_schema} for handoff in handoffs],
+    }
+
+
+class CachedModel(Model):
+    '''Model wrapper that answers repeated calls from a TTL/LRU cache.
+
+    The exact key covers the instructions, input, tools, handoffs, output schema and settings.
+    In 'semantic' mode a single-message input may also reuse the answer to a near-duplicate
+    message sent with the same context, if both contain the same numbers, so "what is 2+2"
+    never answers "what is 2+3". Calls with temperature > 0, or no temperature set, bypass the
+    cache unless `allow_sampled`, so set temperature=0 where caching is wanted. Hits report zero
+    usage, since no tokens were spent.
+    '''
+
+    def __init__(self, model: Model, name: str, mode: str = 'exact', maxsize: int = MODEL_CACHE_SIZE,
+                 ttl: float = MODEL_CACHE_TTL, threshold: float = MODEL_CACHE_THRESHOLD, allow_sampled: bool = MODEL_CACHE_SAMPLED):
+        if mode not in ('exact', 'semantic'):
+            raise ValueError(f'Unknown cache mode {mode!r}, use "exact" or "semantic"')
+        self.model = model
+        self.name = name
+        self.mode = mode
+        self.threshold = threshold
+        self.allow_sampled = allow_sampled
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # One index per (context, numbers) scope, so only comparable messages are ever matched
+        self.indexes: OrderedDict[str, SemanticIndex] = OrderedDict()
+        self.bypassed = 0
+
+    def _keys(self, stream: bool, system_instructions, input, model_settings, tools, output_schema, handoffs, previous_response_id):
+        '''Exact key and semantic (scope, text), or None if the call must not be cached.'''
+        # An unset temperature means the provider's default, which samples (Gemini's is not 0)
+        sampled = model_settings.temperature is None or model_settings.temperature > 0
+        if previous_response_id or (sampled and not self.allow_sampled):
+            self.bypassed += 1
+            return None
+
+        context = request_context(self.name, system_instructions, model_settings, tools, output_schema, handoffs)
+        key = _hash({'stream': stream, 'context': context, 'input': input})
+        if self.mode != 'semantic' or not (isinstance(input, str) or len(input) == 1):
+            return key, None
+
+        text = normalize_input(input_text(input))
+        scope = _hash({'stream': stream, 'context': context, 'numbers': NUMBER.findall(text)})
+        return key, (scope, text)
+
+    def _index(self, scope: str) -> SemanticIndex:
+        if scope not in self.indexes:
+            self.indexes[scope] = SemanticIndex(self.cache, threshold=self.threshold)
+            while len(self.indexes) > self.cache.maxsize:
+                self.indexes.popitem(last=False)
+        self.indexes.move_to_end(scope)
+        return self.indexes[scope]
+
+    async def get_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *, previous_response_id=None) -> ModelResponse:
+        call = lambda: self.model.get_response(system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                                               previous_response_id=previous_response_id)
+        keys = self._keys(False, system_instructions, input, model_settings, tools, output_schema, handoffs, previous_response_id)
+        if keys is None:
+            return await call()
+
+        key, semantic = keys
+        fetched = False
+
+        async def fetch():
+            nonlocal fetched
+            fetched = True
+            response = await call()
+            if semantic is not None:
+                self._index(semantic[0]).add(key, semantic[1])
+            return response
+
+        similar = (lambda: self._index(semantic[0]).lookup(semantic[1])) if semantic else None
+        response = await self.cache.get_or_fetch(key, fetch, similar)
+        # Cache hits and calls that waited on someone else's fetch spent no tokens
+        return response if fetched else dataclasses.replace(response, usage=Usage())
+
+    async def stream_response(self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, *, previous_response_id=None):
+        keys = self._keys(True, system_instructions, input, model_settings, tools, output_schema, handoffs, previous_response_id)
+        if keys is not None:
+            key, semantic = keys
+            events = self.cache.peek(key)
+            if events is TTLCache.MISSING and semantic is not None:
+                events = self._index(semantic[0]).lookup(semantic[1])
+                if events is not TTLCache.MISSING:
+                    self.cache.similar_hits += 1
+            if events is not TTLCache.MISSING:
+                self.cache.hits += 1
+                for event in events:
+                    yield event
+                return
+            self.cache.misses += 1
+
+        recorded = []
+        async for event in self.model.stream_response(system_instructions, input, model_settings, tools, output_schema, handoffs, tracing,
+                                                      previous_response_id=previous_response_id):
+            recorded.append(event)
+            yield event
+
+        # Only complete streams are worth replaying. Like non-streamed hits, replays report no usage,
+        # since no tokens are spent on them.
+        if keys is not None and recorded and recorded[-1].type == 'response.completed':
+            completed = recorded[-1]
+            recorded[-1] = completed.model_copy(update={'response': completed.response.model_copy(update={'usage': None})})
+            self.cache.set(key, recorded)
+            if semantic is not None:
+                self._index(semantic[0]).add(key, semantic[1])
+
+    @property
+    def stats(self) -> dict:
+        return {**self.cache.stats, 'bypassed': self.bypassed}
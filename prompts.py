@@ -0,0 +1,42 @@
+from collections import Counter
+from typing import Any, Callable
+from agents import Agent, RunContextWrapper
+
+
+class PromptTemplate:
+    '''Dynamic instructions rendered once per variant instead of on every turn.
+
+    `key` picks a variant from the run context, e.g. `lambda ctx: ctx.style`. Every variant is
+    rendered up front as the shared `prefix` followed by the variant's own text, with `fields`
+    filled in, so a turn costs one dict lookup and returns the very same string each time.
+    Keeping the shared text first and the varying part short and last means every variant sends
+    the same leading bytes, which is what provider-side prompt (prefix) caching matches on.
+    Unknown keys get the `default` variant. Pass an instance as an Agent's `instructions`.
+    '''
+
+    def __init__(self, variants: dict[str, str], key: Callable[[Any], str], prefix: str = '', default: str | None = None,
+                 separator: str = '\n\n', **fields: Any):
+        if default is not None and default not in variants:
+            raise ValueError(f'Default variant {default!r} is not one of {list(variants)}')
+        render = (lambda text: text.format(**fields)) if fields else (lambda text: text)
+        self.prefix = render(prefix)
+        self.rendered = {name: separator.join(filter(None, (self.prefix, render(text)))) for name, text in variants.items()}
+        self.key = key
+        self.default = default
+        self.uses: Counter[str] = Counter()
+
+    def render(self, context: Any) -> str:
+        name = self.key(context)
+        if name not in self.rendered:
+            if self.default is None:
+                raise KeyError(f'No instructions for {name!r}, expected one of {list(self.rendered)}')
+            name = self.default
+        self.uses[name] += 1
+        return self.rendered[name]
+
+    def __call__(self, ctx: RunContextWrapper, agent: Agent) -> str:
+        return self.render(ctx.context)
+
+    @property
+    def stats(self) -> dict:
+        return {'variants': len(self.rendered), 'prefix_chars': len(self.prefix), 'uses': dict(self.uses)}
@@ -0,0 +1,132 @@
+import os
+import importlib.util
+from dotenv import load_dotenv
+import httpx
+from agents import AsyncOpenAI, OpenAIChatCompletionsModel, ModelSettings, ModelProvider, Model
+from agents.run import RunConfig
+from ratelimit import RateLimiter, RateLimitedTransport, rate_limiter
+from metrics import InstrumentedModel
+from cassette import CASSETTE_MODE, CassetteTransport, get_cassette
+from model_cache import MODEL_CACHE, CachedModel
+
+
+load_dotenv()
+
+
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta/openai/')
+DEFAULT_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+
+# Pool settings, overridable from the environment so workers can be tuned without code changes
+MAX_CONNECTIONS = int(os.getenv('AGENT_MAX_CONNECTIONS', '100'))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('AGENT_MAX_KEEPALIVE_CONNECTIONS', '20'))
+KEEPALIVE_EXPIRY = float(os.getenv('AGENT_KEEPALIVE_EXPIRY', '60'))
+CONNECT_TIMEOUT = float(os.getenv('AGENT_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('AGENT_READ_TIMEOUT', '60'))
+HTTP2 = os.getenv('AGENT_HTTP2', '1') == '1'
+
+
+_http_clients: dict[str, httpx.AsyncClient] = {}
+_clients: dict[str, AsyncOpenAI] = {}
+_models: dict[tuple[str, str, str], Model] = {}
+
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional `h2` package is installed
+    return HTTP2 and importlib.util.find_spec('h2') is not None
+
+
+def get_http_client(base_url: str = GEMINI_BASE_URL, limiter: RateLimiter | None = None, cassette: bool = False) -> httpx.AsyncClient:
+    '''Return the keep-alive connection pool for the given base URL, creating it once.
+
+    When a limiter is given, every request on the pool goes through it (rate limits and retries).
+    With `cassette` and CASSETTE_MODE set, traffic is recorded to or replayed from CASSETTE_PATH
+    (see cassette.py). Only the model clients ask for that.
+    '''
+    if base_url not in _http_clients:
+        transport = httpx.AsyncHTTPTransport(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        if limiter is not None:
+            transport = RateLimitedTransport(transport, limiter)
+        if cassette and CASSETTE_MODE:
+            # Outermost, so replayed requests never wait on the rate limiter
+            transport = CassetteTransport(transport, get_cassette())
+
+        _http_clients[base_url] = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+    return _http_clients[base_url]
+
+
+def get_client(base_url: str = GEMINI_BASE_URL, api_key: str | None = None) -> AsyncOpenAI:
+    '''Return the shared AsyncOpenAI client for the given base URL.'''
+    if base_url not in _clients:
+        api_key = api_key or GEMINI_API_KEY
+        if not api_key:
+            raise ValueError('Gemini API Key is not valid.')
+
+        # Retries are handled by the rate limited transport, where they are coordinated across callers
+        _clients[base_url] = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=get_http_client(base_url, rate_limiter, cassette=True),
+            max_retries=0,
+        )
+    return _clients[base_url]
+
+
+def get_model(name: str = DEFAULT_MODEL, base_url: str = GEMINI_BASE_URL, cache: str = MODEL_CACHE) -> Model:
+    '''Return a chat completions model bound to the shared client for base_url, timed by metrics.py.
+
+    `cache` is '' for no response cache, or 'exact' / 'semantic' (see model_cache.py).
+    '''
+    key = (base_url, name, cache)
+    if key not in _models:
+        model = InstrumentedModel(OpenAIChatCompletionsModel(
+            model=name,
+            openai_client=get_client(base_url)
+        ), name)
+        # Cache outside the instrumentation so hits don't count as model calls
+        _models[key] = CachedModel(model, name, cache) if cache else model
+    return _models[key]
+
+
+class PooledModelProvider(ModelProvider):
+    '''Model provider that hands out models backed by the shared connection pools.'''
+
+    def __init__(self, base_url: str = GEMINI_BASE_URL, cache: str = MODEL_CACHE):
+        self.base_url = base_url
+        self.cache = cache
+
+    def get_model(self, model_name: str | None) -> Model:
+        return get_model(model_name or DEFAULT_MODEL, self.base_url, self.cache)
+
+
+def get_run_config(model_settings: ModelSettings | None = None, model_name: str = DEFAULT_MODEL, base_url: str = GEMINI_BASE_URL,
+                   model_cache: str = MODEL_CACHE, **kwargs) -> RunConfig:
+    '''Build a RunConfig that uses the pooled model. Extra kwargs are passed to RunConfig.'''
+    kwargs.setdefault('tracing_disabled', True)
+    return RunConfig(
+        model=get_model(model_name, base_url, model_cache),
+        model_provider=PooledModelProvider(base_url, model_cache),
+        model_settings=model_settings,
+        **kwargs
+    )
+
+
+async def aclose():
+    '''Close every pooled connection. Call this once on shutdown.'''
+    for http_client in _http_clients.values():
+        await http_client.aclose()
+
+    _http_clients.clear()
+    _clients.clear()
+    _models.clear()
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import contextvars
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import httpx
+from metrics import metrics
+
+
+GEMINI_RPM = float(os.getenv('GEMINI_RPM', '60'))
+GEMINI_TPM = float(os.getenv('GEMINI_TPM', '1000000'))
+RATE_LIMIT_RETRIES = int(os.getenv('RATE_LIMIT_RETRIES', '5'))
+RATE_LIMIT_BASE_DELAY = float(os.getenv('RATE_LIMIT_BASE_DELAY', '1'))
+RATE_LIMIT_MAX_DELAY = float(os.getenv('RATE_LIMIT_MAX_DELAY', '60'))
+# Completion tokens assumed for a request that does not set max_tokens
+DEFAULT_OUTPUT_TOKENS = 512
+
+INTERACTIVE = 0
+BATCH = 1
+LANES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar('current_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def priority(lane: int):
+    '''Run model calls made inside this block in the given lane, e.g. `with priority(BATCH):`.'''
+    token = current_priority.set(lane)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        '''Seconds until `amount` can be taken.'''
+        self.refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.refill()
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    '''Requests-per-minute and tokens-per-minute limiter shared by every model call in the process.
+
+    Waiters are served strictly by lane (interactive before batch), then in arrival order.
+    A 429 pauses the whole limiter for the Retry-After period so that other callers do not
+    keep hammering the endpoint while it is throttling us.
+    '''
+
+    def __init__(self, rpm: float = GEMINI_RPM, tpm: float = GEMINI_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self._waiting: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._changed = asyncio.Event()
+        self.acquired = 0
+        self.retries = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _delay(self, cost: float) -> float:
+        return max(self.paused_until - time.monotonic(), self.requests.delay(1), self.tokens.delay(cost))
+
+    async def acquire(self, cost: float, lane: int | None = None):
+        '''Wait until one request and `cost` tokens are available.'''
+        entry = (current_priority.get() if lane is None else lane, next(self._counter))
+        heapq.heappush(self._waiting, entry)
+        started = time.monotonic()
+        try:
+            while True:
+                changed = self._changed
+                if self._waiting[0] == entry:
+                    delay = self._delay(cost)
+                    if delay <= 0:
+                        heapq.heappop(self._waiting)
+                        self.requests.take(1)
+                        self.tokens.take(cost)
+                        break
+                else:
+                    delay = None
+
+                try:
+                    await asyncio.wait_for(changed.wait(), delay)
+                except TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            raise
+        finally:
+            self._notify()
+
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def adjust(self, estimated: float, actual: float):
+        '''Correct the token bucket once the real usage of a request is known.'''
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+        self._notify()
+
+    def pause(self, seconds: float):
+        self.throttled += 1
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self._notify()
+
+    @property
+    def stats(self) -> dict:
+        depth = {name: 0 for name in LANES.values()}
+        for lane, _ in self._waiting:
+            depth[LANES.get(lane, str(lane))] += 1
+        return {
+            'queue_depth': len(self._waiting),
+            'queue_depth_by_lane': depth,
+            'acquired': self.acquired,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'avg_wait': self.total_wait / self.acquired if self.acquired else 0.0,
+            'max_wait': self.max_wait,
+            'paused_for': max(0.0, self.paused_until - time.monotonic()),
+            'requests_available': self.requests.level,
+            'tokens_available': self.tokens.level,
+        }
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    value = response.headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = RATE_LIMIT_BASE_DELAY, cap: float = RATE_LIMIT_MAX_DELAY) -> float:
+    # Full jitter: uniformly random between 0 and the exponential ceiling
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    '''httpx transport that routes every request through a RateLimiter and retries 429/5xx and
+    connection errors with jittered exponential backoff, honoring Retry-After when present.'''
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter, max_retries: int = RATE_LIMIT_RETRIES):
+        self.transport = transport
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+    def estimate_tokens(self, request: httpx.Request) -> tuple[float, bool]:
+        try:
+            payload = json.loads(request.content)
+        except (ValueError, httpx.RequestNotRead):
+            return DEFAULT_OUTPUT_TOKENS, False
+        output_tokens = payload.get('max_tokens') or payload.get('max_completion_tokens') or DEFAULT_OUTPUT_TOKENS
+        return len(request.content) / 4 + output_tokens, bool(payload.get('stream'))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        cost, stream = self.estimate_tokens(request)
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(cost)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                self.limiter.retries += 1
+                metrics.inc('model_retries_total', reason='connection')
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            if response.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                delay = retry_after_seconds(response)
+                await response.aclose()
+                self.limiter.retries += 1
+                metrics.inc('model_retries_total', reason=str(response.status_code))
+                if response.status_code == 429:
+                    self.limiter.pause(delay if delay is not None else backoff_delay(attempt))
+                else:
+                    await asyncio.sleep(delay if delay is not None else backoff_delay(attempt))
+                continue
+
+            if response.status_code == 200 and not stream:
+                body = await response.aread()
+                try:
+                    usage = json.loads(body).get('usage') or {}
+                    self.limiter.adjust(cost, usage.get('total_tokens', cost))
+                except (ValueError, AttributeError):
+                    pass
+                # The body is already decoded, so drop the headers describing the wire encoding
+                headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+                return httpx.Response(response.status_code, headers=headers, content=body,
+                                      request=request, extensions=response.extensions)
+            return response
+
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+rate_limiter = RateLimiter()
+metrics.add_collector(lambda: {f'rate_limiter_{key}': value for key, value in rate_limiter.stats.items() if isinstance(value, (int, float))})
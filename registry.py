@@ -0,0 +1,41 @@
+import importlib
+from typing import Any
+from pydantic import BaseModel
+from agents import Agent
+from agents.run import RunConfig
+
+
+# name -> (module, agent attribute). Modules are only imported when the agent is first requested.
+AGENTS = {
+    'triage': ('main', 'triage_agent'),
+    'calculator': ('func_tool', 'calculator_agent'),
+    'weather': ('api_calling', 'weather_agent'),
+    'maths': ('guardrails', 'math_homework_agent'),
+    'teaching': ('handoff', 'triage_agent'),
+}
+
+
+def load_agent(name: str, allow_specs: bool = False) -> tuple[Agent, RunConfig]:
+    '''Return an agent and the run config its script uses.
+
+    `name` is a key of AGENTS. With `allow_specs`, a `module:attribute` spec such as
+    `main:calculator_agent` is accepted too. That imports arbitrary modules, so it is only for
+    trusted callers like the batch CLI, never for names that come from a request.
+    '''
+    if isinstance(name, str) and name in AGENTS:
+        module_name, attr = AGENTS[name]
+    elif allow_specs and isinstance(name, str) and ':' in name:
+        module_name, attr = name.split(':', 1)
+    else:
+        raise KeyError(f'Unknown agent {name!r}. Choose one of {", ".join(AGENTS)}' + (' or use module:attribute.' if allow_specs else '.'))
+
+    module = importlib.import_module(module_name)
+    return getattr(module, attr), getattr(module, 'config')
+
+
+def serialize_output(output: Any) -> Any:
+    if isinstance(output, BaseModel):
+        return output.model_dump()
+    if isinstance(output, (str, int, float, bool, dict, list)) or output is None:
+        return output
+    return str(output)
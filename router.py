@@ -0,0 +1,127 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable
+from agents import Agent, RunResult, TResponseInputItem
+from agents.run import RunConfig
+from cache import hashed_embedding, cosine
+from guardrail_pipeline import input_text, run_guarded
+
+
+@dataclass
+class Match:
+    target: str
+    confidence: float
+    rule: str
+
+
+Rule = Callable[[str], Match | None]
+
+
+ARITHMETIC_PATTERN = re.compile(
+    r'^\s*(what\s+is|what\'s|calculate|compute|evaluate|solve)?\s*'
+    r'(?=[^a-z]*\d\s*[-+*/^%x×÷]\s*[(\d.])[-+*/^%x×÷().\d\s,]+\s*[?=]?\s*$',
+    re.IGNORECASE
+)
+
+
+def arithmetic_rule(target: str, confidence: float = 0.95) -> Rule:
+    '''Match inputs that are nothing but an arithmetic expression, e.g. "what is (3+4)*5/2?".'''
+    def rule(text: str) -> Match | None:
+        if ARITHMETIC_PATTERN.match(text):
+            return Match(target, confidence, 'arithmetic')
+        return None
+    return rule
+
+
+def keyword_rule(target: str, pattern: str, confidence: float = 0.85) -> Rule:
+    '''Match inputs containing any of the words or phrases in a regex alternation.'''
+    compiled = re.compile(rf'\b({pattern})\b', re.IGNORECASE)
+
+    def rule(text: str) -> Match | None:
+        found = compiled.search(text)
+        if found:
+            return Match(target, confidence, f'keyword:{found.group(0).lower()}')
+        return None
+    return rule
+
+
+def example_rule(target: str, examples: list[str], threshold: float = 0.75) -> Rule:
+    '''Tiny local classifier: match when the input is close to one of the labelled examples.
+    Confidence is the cosine similarity of their hashed embeddings.'''
+    vectors = [hashed_embedding(example) for example in examples]
+
+    def rule(text: str) -> Match | None:
+        vector = hashed_embedding(text)
+        score = max(cosine(vector, other) for other in vectors)
+        if score >= threshold:
+            return Match(target, score, 'example')
+        return None
+    return rule
+
+
+# Only words that hardly ever appear off-topic: a single keyword match is enough to skip triage, so
+# everyday words like "times", "plus", "war" or "king" ("What times does the museum open?") stay out.
+CALCULATOR_KEYWORDS = r'calculate|multiply|square root|percent of'
+TRANSLATOR_KEYWORDS = r'translate|translation|how do you say'
+
+
+def calculator_translator_rules(calculator: str = 'calculator', translator: str = 'translator') -> list[Rule]:
+    '''Rules for the calculator/translator triage shared by main.py and st_version.py.'''
+    return [
+        arithmetic_rule(calculator),
+        keyword_rule(calculator, CALCULATOR_KEYWORDS),
+        keyword_rule(translator, TRANSLATOR_KEYWORDS),
+    ]
+
+
+class PreRouter:
+    '''Deterministic router that can skip the LLM triage hop.
+
+    Every rule sees the input text and may vote for a target agent with a confidence. If the
+    best target reaches `threshold` and no other target also does, the input goes straight to
+    that agent. Otherwise it goes to the triage agent as before.
+    '''
+
+    def __init__(self, triage_agent: Agent, targets: dict[str, Agent], rules: list[Rule], threshold: float = 0.8):
+        self.triage_agent = triage_agent
+        self.targets = targets
+        self.rules = rules
+        self.threshold = threshold
+        self.paths: Counter[str] = Counter()
+
+    def matches(self, text: str) -> dict[str, Match]:
+        '''The most confident match for each target that any rule voted for.'''
+        best: dict[str, Match] = {}
+        for rule in self.rules:
+            match = rule(text)
+            if match is not None and (match.target not in best or match.confidence > best[match.target].confidence):
+                best[match.target] = match
+        return best
+
+    def scores(self, text: str) -> dict[str, float]:
+        return {target: match.confidence for target, match in self.matches(text).items()}
+
+    def route(self, text: str) -> Match | None:
+        confident = [match for match in self.matches(text).values() if match.confidence >= self.threshold]
+        if len(confident) != 1:
+            return None
+        return confident[0]
+
+    def pick(self, input: str | list[TResponseInputItem]) -> Agent:
+        match = self.route(input_text(input))
+        if match is None:
+            self.paths['triage'] += 1
+            return self.triage_agent
+
+        self.paths[f'direct:{match.target}'] += 1
+        return self.targets[match.target]
+
+    async def run(self, input: str | list[TResponseInputItem], *, run_config: RunConfig | None = None, **kwargs: Any) -> RunResult:
+        return await run_guarded(self.pick(input), input, run_config=run_config, **kwargs)
+
+    @property
+    def stats(self) -> dict:
+        total = sum(self.paths.values())
+        direct = total - self.paths['triage']
+        return {'total': total, 'direct_rate': direct / total if total else 0.0, 'paths': dict(self.paths)}
@@ -0,0 +1,221 @@
+import os
+import json
+import signal
+import asyncio
+import argparse
+from collections import defaultdict
+from agents import InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered, MaxTurnsExceeded
+import provider
+from registry import load_agent, serialize_output
+from guardrail_pipeline import run_guarded
+from sessions import SessionStore
+from ratelimit import rate_limiter
+from metrics import MetricsHooks, start_exporters
+
+
+MAX_CONCURRENCY = int(os.getenv('SERVER_MAX_CONCURRENCY', '32'))
+MAX_QUEUE = int(os.getenv('SERVER_MAX_QUEUE', '128'))
+REQUEST_TIMEOUT = float(os.getenv('SERVER_REQUEST_TIMEOUT', '60'))
+SHUTDOWN_GRACE = float(os.getenv('SERVER_SHUTDOWN_GRACE', '30'))
+MAX_BODY = 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           422: 'Unprocessable Entity', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: dict | None = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class AgentServer:
+    '''Minimal asyncio HTTP/1.1 server that runs agents for many sessions at once.
+
+    POST /run with {"agent": "triage", "input": "...", "session_id": "optional"}.
+    At most `max_concurrency` runs execute at a time and at most `max_queue` more may wait;
+    anything beyond that is rejected with 503 so clients back off instead of piling up.
+    '''
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE,
+                 request_timeout: float = REQUEST_TIMEOUT, store: SessionStore | None = None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.store = store
+        self.session_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.queued = 0
+        self.in_flight = 0
+        self.served = 0
+        self.shutting_down = False
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.server: asyncio.Server | None = None
+        self.hooks = MetricsHooks()
+
+    async def run_agent(self, body: dict) -> dict:
+        try:
+            agent, config = load_agent(body['agent'])
+            user_input = body['input']
+        except KeyError as e:
+            raise HTTPError(400, f'Bad request: {e}')
+        if not isinstance(user_input, (str, list)):
+            raise HTTPError(400, 'Bad request: input must be a string or a list of items')
+
+        session_id = body.get('session_id')
+        if session_id is not None and not isinstance(session_id, str):
+            raise HTTPError(400, 'Bad request: session_id must be a string')
+        if session_id and self.store is None:
+            raise HTTPError(400, 'Sessions are not enabled on this server')
+
+        if session_id:
+            async with self.session_locks[session_id]:
+                history = self.store.load_history(session_id)
+                history.add_user(user_input)
+                result = await run_guarded(agent, history.to_input(), run_config=config, hooks=self.hooks)
+                history.add_result(result)
+                self.store.append(session_id, history.turns[-1].items)
+        else:
+            result = await run_guarded(agent, user_input, run_config=config, hooks=self.hooks)
+
+        return {'agent': result.last_agent.name, 'output': serialize_output(result.final_output)}
+
+    async def handle_run(self, body: dict) -> dict:
+        if self.shutting_down:
+            raise HTTPError(503, 'Server is shutting down')
+        if self.queued >= self.max_queue:
+            raise HTTPError(503, 'Too many requests queued', {'Retry-After': '1'})
+
+        self.queued += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        self.idle.clear()
+        try:
+            return await asyncio.wait_for(self.run_agent(body), self.request_timeout)
+        except TimeoutError:
+            raise HTTPError(504, f'Agent run exceeded {self.request_timeout}s')
+        except (InputGuardrailTripwireTriggered, OutputGuardrailTripwireTriggered) as e:
+            raise HTTPError(422, f'Guardrail triggered: {e.guardrail_result.guardrail.get_name()}')
+        except MaxTurnsExceeded as e:
+            raise HTTPError(422, str(e))
+        finally:
+            self.semaphore.release()
+            self.in_flight -= 1
+            self.served += 1
+            if self.in_flight == 0:
+                self.idle.set()
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> dict:
+        if path == '/health':
+            return {'status': 'shutting_down' if self.shutting_down else 'ok', 'in_flight': self.in_flight,
+                    'queued': self.queued, 'served': self.served, 'rate_limiter': rate_limiter.stats}
+        if path != '/run':
+            raise HTTPError(404, f'No route for {path}')
+        if method != 'POST':
+            raise HTTPError(405, 'Use POST')
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, 'Body must be JSON')
+        if not isinstance(payload, dict):
+            raise HTTPError(400, 'Body must be a JSON object')
+        return await self.handle_run(payload)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while not self.shutting_down:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    key, value = line.decode('latin-1').split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', '0'))
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                extra_headers = {}
+                try:
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise HTTPError(413, 'Request body too large')
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = 200, await self.dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, {'error': str(e)}, e.headers
+                except Exception as e:
+                    status, payload = 500, {'error': repr(e)}
+
+                data = json.dumps(payload).encode()
+                headers_out = {
+                    'Content-Type': 'application/json',
+                    'Content-Length': str(len(data)),
+                    'Connection': 'keep-alive' if keep_alive and not self.shutting_down else 'close',
+                    **extra_headers
+                }
+                head = f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers_out.items())
+                writer.write(head.encode('latin-1') + b'\r\n' + data)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000):
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f'Serving agents on http://{host}:{port}')
+        start_exporters()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        if self.store is not None:
+            self.store.start()
+
+        await stop.wait()
+        await self.shutdown()
+
+    async def shutdown(self, grace: float = SHUTDOWN_GRACE):
+        '''Stop accepting connections, let in-flight runs finish (up to `grace` seconds), then close pools.'''
+        self.shutting_down = True
+        if self.server is not None:
+            self.server.close()
+
+        try:
+            await asyncio.wait_for(self.idle.wait(), grace)
+        except TimeoutError:
+            print(f'Shutdown grace period over with {self.in_flight} runs still in flight')
+
+        if self.server is not None:
+            self.server.close_clients()
+
+        if self.store is not None:
+            await self.store.close()
+        await provider.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the agents in this repo over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--sessions', action='store_true', help='persist conversations by session_id in sessions.db')
+    args = parser.parse_args()
+
+    async def main():
+        server = AgentServer(store=SessionStore() if args.sessions else None)
+        await server.serve(args.host, args.port)
+
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Iterable
+from history import ConversationHistory, is_user_message
+
+
+SESSIONS_DB_PATH = os.getenv('SESSIONS_DB_PATH', 'sessions.db')
+
+
+class SessionStore:
+    '''Append-only conversation log in SQLite, keyed by session id.
+
+    Several worker processes can share one database file: every worker only appends the items
+    its own runs produced, and readers only load the recent tail of a session. Appends are
+    buffered and written in batches; `start()` runs the flusher and compaction in the background.
+    '''
+
+    def __init__(self, path: str = SESSIONS_DB_PATH, batch_size: int = 50, flush_interval: float = 0.5,
+                 max_items: int = 500, compact_interval: float = 300):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_items = max_items
+        self.compact_interval = compact_interval
+        self._pending: list[tuple[str, str, int, float]] = []
+        self._lock = threading.Lock()
+        self._tasks: list[asyncio.Task] = []
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            item TEXT NOT NULL,
+            is_user INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS items_session ON items (session_id, id)')
+
+    def append(self, session_id: str, items: Iterable[Any]):
+        '''Buffer items for writing. They become visible to other workers after the next flush.'''
+        now = time.time()
+        with self._lock:
+            self._pending.extend((session_id, json.dumps(item, default=str), int(is_user_message(item)), now) for item in items)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                with self.conn:
+                    self.conn.executemany('INSERT INTO items (session_id, item, is_user, created_at) VALUES (?, ?, ?, ?)', pending)
+        return len(pending)
+
+    def load_tail(self, session_id: str, limit: int = 100) -> list[Any]:
+        '''Load at most `limit` of the newest items, starting at a user message so that no
+        tool call is separated from its output.'''
+        self.flush()
+        rows = self.conn.execute(
+            'SELECT item, is_user FROM items WHERE session_id = ? ORDER BY id DESC LIMIT ?', (session_id, limit)
+        ).fetchall()
+        rows.reverse()
+
+        start = next((i for i, (_, is_user) in enumerate(rows) if is_user), len(rows))
+        return [json.loads(item) for item, _ in rows[start:]]
+
+    def load_history(self, session_id: str, max_tokens: int = 4000, limit: int = 100, **kwargs) -> ConversationHistory:
+        history = ConversationHistory(max_tokens=max_tokens, **kwargs)
+        history.add_items(self.load_tail(session_id, limit))
+        history.trim()
+        return history
+
+    def sessions(self) -> list[str]:
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT session_id FROM items')]
+
+    def compact(self) -> int:
+        '''Delete everything but the newest `max_items` items of each session, cutting at a
+        user message. Returns the number of rows removed.'''
+        self.flush()
+        removed = 0
+        with self._lock, self.conn:
+            for session_id in self.sessions():
+                row = self.conn.execute(
+                    'SELECT id FROM items WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?', (session_id, self.max_items - 1)
+                ).fetchone()
+                if row is None:
+                    continue
+
+                row = self.conn.execute(
+                    'SELECT MIN(id) FROM items WHERE session_id = ? AND id >= ? AND is_user = 1', (session_id, row[0])
+                ).fetchone()
+                if row[0] is None:
+                    continue
+
+                removed += self.conn.execute('DELETE FROM items WHERE session_id = ? AND id < ?', (session_id, row[0])).rowcount
+        return removed
+
+    async def _every(self, interval: float, func):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(func)
+
+    def start(self):
+        '''Start background flushing and compaction on the running event loop.'''
+        self._tasks = [
+            asyncio.create_task(self._every(self.flush_interval, self.flush)),
+            asyncio.create_task(self._every(self.compact_interval, self.compact)),
+        ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.flush)
+        self.conn.close()
@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+from collections import Counter
+from typing import Any
+from agents import Agent, RunHooks, RunContextWrapper, RunResult, Tool, TResponseInputItem
+from agents.run import RunConfig
+from guardrail_pipeline import input_text, run_guarded
+from history import estimate_tokens
+from metrics import metrics
+from ratelimit import TokenBucket
+from router import PreRouter
+
+
+# Opt-in: start likely specialists alongside the triage call
+SPECULATE = os.getenv('SPECULATE', '0') == '1'
+# How many specialists to start per request
+SPECULATION_WIDTH = int(os.getenv('SPECULATION_WIDTH', '1'))
+# Tokens per minute that may be spent on speculative runs nobody uses
+SPECULATION_WASTE_TPM = float(os.getenv('SPECULATION_WASTE_TPM', '20000'))
+
+
+class ForwardingHooks(RunHooks):
+    '''RunHooks that pass every event on to the caller's hooks, if any, so the caller still sees
+    (and e.g. measures) every run speculation starts.'''
+
+    def __init__(self, inner: RunHooks | None = None):
+        self.inner = inner or RunHooks()
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent):
+        await self.inner.on_agent_start(context, agent)
+
+    async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: Any):
+        await self.inner.on_agent_end(context, agent, output)
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent):
+        await self.inner.on_handoff(context, from_agent, to_agent)
+
+    async def on_tool_start(self, context: RunContextWrapper, agent: Agent, tool: Tool):
+        await self.inner.on_tool_start(context, agent, tool)
+
+    async def on_tool_end(self, context: RunContextWrapper, agent: Agent, tool: Tool, result: str):
+        await self.inner.on_tool_end(context, agent, tool, result)
+
+
+class DecisionHooks(ForwardingHooks):
+    '''Report the triage agent's handoff through a future, then hold the triage run at the handoff
+    so it never starts the specialist itself. The run is cancelled from outside.'''
+
+    def __init__(self, decision: asyncio.Future, inner: RunHooks | None = None):
+        super().__init__(inner)
+        self.decision = decision
+
+    async def on_handoff(self, context: RunContextWrapper, from_agent: Agent, to_agent: Agent):
+        await super().on_handoff(context, from_agent, to_agent)
+        if not self.decision.done():
+            self.decision.set_result(to_agent)
+        await asyncio.Event().wait()
+
+
+class UsageHooks(ForwardingHooks):
+    '''Keep hold of a run's context, so the usage of a run that gets cancelled can still be read.'''
+
+    def __init__(self, inner: RunHooks | None = None):
+        super().__init__(inner)
+        self.context: RunContextWrapper | None = None
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent):
+        self.context = context
+        await super().on_agent_start(context, agent)
+
+
+class SpeculativeRouter:
+    '''PreRouter that, when it can't skip triage, starts the likely specialists alongside the
+    triage call instead of after it.
+
+    The triage agent runs until it hands off. If it picks a specialist that is already running,
+    that run's result is returned and the others are cancelled; if not, the chosen specialist
+    starts then, as it would have anyway. Candidates are ranked by the router's rule scores, then
+    by how often triage picked them before.
+
+    Specialists started early see the user's input rather than the filtered handoff input, and
+    handoff callbacks (e.g. on_handoff printing a payload) still run in the triage run. Tokens
+    spent by runs nobody uses are drawn from a per-minute budget; while it is empty requests take
+    the plain triage path.
+    '''
+
+    def __init__(self, router: PreRouter, width: int = SPECULATION_WIDTH, waste_per_minute: float = SPECULATION_WASTE_TPM):
+        self.router = router
+        self.width = width
+        self.budget = TokenBucket(waste_per_minute)
+        # Triage decisions per target, used as a prior when no rule has an opinion
+        self.choices: Counter[str] = Counter()
+        self.outcomes: Counter[str] = Counter()
+        self.wasted_tokens = 0
+        self.run_tokens = 0.0
+
+    def candidates(self, text: str) -> list[str]:
+        scores = self.router.scores(text)
+        ranked = sorted(self.router.targets, key=lambda target: (scores.get(target, 0.0), self.choices[target]), reverse=True)
+        return ranked[:self.width]
+
+    def _target(self, agent: Agent) -> str | None:
+        return next((name for name, target in self.router.targets.items() if target.name == agent.name), None)
+
+    def _outcome(self, outcome: str):
+        self.outcomes[outcome] += 1
+        metrics.inc('speculation_total', outcome=outcome)
+
+    async def run(self, input: str | list[TResponseInputItem], *, run_config: RunConfig | None = None,
+                  hooks: RunHooks | None = None, **kwargs: Any) -> RunResult:
+        '''Like PreRouter.run. The caller's `hooks` see every run this starts, including
+        speculative ones that end up discarded.'''
+        text = input_text(input)
+        if self.router.route(text) is not None:
+            return await self.router.run(input, run_config=run_config, hooks=hooks, **kwargs)
+
+        candidates = self.candidates(text)
+        if not candidates or self.budget.delay(self.run_tokens * len(candidates)) > 0:
+            self._outcome('skipped')
+            return await self.router.run(input, run_config=run_config, hooks=hooks, **kwargs)
+        self.router.paths['speculative'] += 1
+
+        decision = asyncio.get_running_loop().create_future()
+        triage = asyncio.create_task(run_guarded(self.router.triage_agent, input, run_config=run_config,
+                                                 hooks=DecisionHooks(decision, hooks), **kwargs))
+        speculative = {}
+        for name in candidates:
+            usage = UsageHooks(hooks)
+            task = asyncio.create_task(run_guarded(self.router.targets[name], input, run_config=run_config, hooks=usage, **kwargs))
+            speculative[name] = (task, usage)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait([triage, decision], return_when=asyncio.FIRST_COMPLETED)
+            if not decision.done():
+                # Triage answered (or failed) without handing off
+                self._outcome('direct')
+                return triage.result()
+
+            metrics.observe('speculation_decision_seconds', time.perf_counter() - started)
+            chosen = decision.result()
+            name = self._target(chosen)
+            if name is not None:
+                self.choices[name] += 1
+            if name in speculative:
+                self._outcome('hit')
+                task, _ = speculative.pop(name)
+                result = await task
+                self.run_tokens += (result.context_wrapper.usage.total_tokens - self.run_tokens) * 0.2
+                return result
+
+            self._outcome('miss')
+            return await run_guarded(chosen, input, run_config=run_config, hooks=hooks, **kwargs)
+        finally:
+            for task in [triage, *(task for task, _ in speculative.values())]:
+                task.cancel()
+            await asyncio.gather(triage, *(task for task, _ in speculative.values()), return_exceptions=True)
+            wasted = sum(self._wasted(task, usage, input) for task, usage in speculative.values())
+            self.wasted_tokens += wasted
+            self.budget.take(wasted)
+            metrics.inc('speculation_wasted_tokens_total', wasted)
+
+    @staticmethod
+    def _wasted(task: asyncio.Task, hooks: UsageHooks, input: str | list[TResponseInputItem]) -> int:
+        '''Tokens a discarded run spent: its usage if it finished, otherwise its recorded usage plus
+        an estimate of the prompt of the model call that was in flight when it was cancelled.'''
+        if not task.cancelled() and task.exception() is None:
+            return task.result().context_wrapper.usage.total_tokens
+        if hooks.context is None:
+            return 0
+        items = [{'content': input, 'role': 'user'}] if isinstance(input, str) else input
+        return hooks.context.usage.total_tokens + sum(map(estimate_tokens, items))
+
+    def run_sync(self, input: str | list[TResponseInputItem], **kwargs: Any) -> RunResult:
+        return asyncio.get_event_loop().run_until_complete(self.run(input, **kwargs))
+
+    @property
+    def stats(self) -> dict:
+        self.budget.refill()
+        decided = self.outcomes['hit'] + self.outcomes['miss'] + self.outcomes['direct']
+        return {
+            'outcomes': dict(self.outcomes),
+            'accuracy': self.outcomes['hit'] / decided if decided else 0.0,
+            'wasted_tokens': self.wasted_tokens,
+            'budget_left': self.budget.level,
+            'choices': dict(self.choices),
+        }
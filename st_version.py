@@ -1,61 +1,64 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel
-from agents.run import RunConfig
+from agents import Agent, Runner, ModelSettings
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 import streamlit as st
 import asyncio
+import queue
+import threading
+import uuid
+from openai.types.responses import ResponseTextDeltaEvent
+from sessions import SessionStore
+from router import PreRouter, calculator_translator_rules
 
 
-load_dotenv()
-
-
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
-
 class AgentOutput(BaseModel):
     response: str
     agent_name: str
 
-calculator_agent = Agent(
-    name='Calculator Agent',
-    instructions='You are a calculator AI agent you can only do calculations. If anything else is told just tell the user you can\'t do anything but calculations.',
-    model=model,
-    output_type=AgentOutput
-)
-
-translator_agent = Agent(
-    name='Translator Agent',
-    instructions='You are a translator AI agent you can only do translations. If anything else is told just tell the user you can\'t do anything but translations.',
-    model=model,
-    output_type=AgentOutput
-)
 
-triage_agent = Agent(
-    name='Triage Agent',
-    instructions='You are a triage Agent. You can only transfer request to other agents. And you cannot answer directlty. If no agent is present to handle a request tell the user that you can "only perform calculations and translations". Do not tell user that you are a triage agent and you can transfer, just handoff to agent or tell "I can only perform calculations and translations" as per required sitiation.',
-    model=model,
-    handoffs=[calculator_agent, translator_agent]
-)
+@st.cache_resource
+def get_agents():
+    '''Build the agents and router once per server process. Streamlit reruns this script on every
+    interaction, and all sessions share these objects and the provider's connection pool.'''
+    model = get_model()
+
+    calculator_agent = Agent(
+        name='Calculator Agent',
+        instructions='You are a calculator AI agent you can only do calculations. If anything else is told just tell the user you can\'t do anything but calculations.',
+        model=model,
+        output_type=AgentOutput
+    )
+
+    translator_agent = Agent(
+        name='Translator Agent',
+        instructions='You are a translator AI agent you can only do translations. If anything else is told just tell the user you can\'t do anything but translations.',
+        model=model,
+        output_type=AgentOutput
+    )
+
+    triage_agent = Agent(
+        name='Triage Agent',
+        instructions='You are a triage Agent. You can only transfer request to other agents. And you cannot answer directlty. If no agent is present to handle a request tell the user that you can "only perform calculations and translations". Do not tell user that you are a triage agent and you can transfer, just handoff to agent or tell "I can only perform calculations and translations" as per required sitiation.',
+        model=model,
+        handoffs=[calculator_agent, translator_agent]
+    )
+
+    router = PreRouter(
+        triage_agent,
+        targets={'calculator': calculator_agent, 'translator': translator_agent},
+        rules=calculator_translator_rules()
+    )
+    # Calculator and translator questions repeat a lot, so identical deterministic calls are answered from cache
+    return router, get_run_config(ModelSettings(temperature=0), model_cache='exact')
+
+
+@st.cache_resource
+def get_event_loop():
+    '''One long-lived event loop in a background thread. Agent runs from every session are submitted
+    to it, so the pooled HTTP connections (which belong to a loop) are reused between runs.'''
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='agents-loop', daemon=True).start()
+    return loop
 
 
 st.set_page_config(
@@ -67,6 +70,8 @@ st.set_page_config(
 st.markdown('<h1 style="position: fixed; font-size: 40px; margin-bottom: 40px; background-color: #0E1117; z-index: 999; width: 90%; top: 40px;">AI Agent</h1>', unsafe_allow_html=True)
 st.markdown("<br><br>", unsafe_allow_html=True)
 
+router, config = get_agents()
+
 role_icon_map = {
     "user": "🧑",
     "assistant": "🤖",
@@ -76,32 +81,126 @@ role_icon_map = {
 }
 
 
-async def main():
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+
+def partial_json_field(text: str, field: str) -> str:
+    '''Decode as much of a JSON string field as has arrived so far in a streamed JSON object.'''
+    start = text.find(f'"{field}"')
+    if start == -1:
+        return ''
+    start = text.find('"', text.find(':', start + len(field) + 2))
+    if start == -1:
+        return ''
+
+    escapes = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+    out = []
+    i = start + 1
+    while i < len(text) and text[i] != '"':
+        if text[i] == '\\':
+            if i + 1 >= len(text) or (text[i + 1] == 'u' and i + 6 > len(text)):
+                break
+            if text[i + 1] == 'u':
+                out.append(chr(int(text[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            out.append(escapes.get(text[i + 1], text[i + 1]))
+            i += 2
+            continue
+        out.append(text[i])
+        i += 1
+    return ''.join(out)
+
+
+def render_message(message):
+    role = message['role']
+    content = message['parts'][0]
+    icon = role_icon_map.get(role, "❓")
+    st.chat_message(role, avatar=icon).write(content)
+
+
+async def pump_events(agent: Agent, chat_input: str, events: queue.Queue):
+    '''Runs on the background loop: forward stream events to the script thread, then a None.'''
+    try:
+        result = Runner.run_streamed(agent, chat_input, run_config=config)
+        async for event in result.stream_events():
+            events.put(event)
+        return result
+    finally:
+        events.put(None)
+
+
+def stream_reply(chat_input: str) -> dict:
+    '''Stream the reply into a single chat message as the deltas arrive and return it for the history.'''
+    agent = router.pick(chat_input)
+    events = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(pump_events(agent, chat_input, events), get_event_loop())
+
+    message = st.chat_message('assistant', avatar=role_icon_map.get(agent.name, "🤖"))
+    status = message.empty()
+    body = message.empty()
+    route = [agent.name]
+    status.caption(' → '.join(f'{role_icon_map.get(name, "🤖")} {name}' for name in route))
+    text = ''
+
+    try:
+        # Placeholders can only be updated from the script thread, so the events come over a queue
+        while (event := events.get()) is not None:
+            if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+                text += event.data.delta
+                # Specialists answer with an AgentOutput JSON object; show only its response field
+                body.markdown((partial_json_field(text, 'response') if agent.output_type else text) + '▌')
+            elif event.type == "agent_updated_stream_event" and event.new_agent.name != route[-1]:
+                agent = event.new_agent
+                route.append(agent.name)
+                text = ''
+                status.caption(' → '.join(f'{role_icon_map.get(name, "🤖")} {name}' for name in route))
+        result = future.result()
+    finally:
+        # The user may stop the script mid-stream; don't leave the run going on the loop
+        future.cancel()
+
+    if result.last_agent.output_type is not None:
+        # AgentOutput is redefined on each rerun, so check the agent rather than isinstance
+        reply = {'role': result.final_output.agent_name, 'parts': [result.final_output.response]}
+    else:
+        # Raw response from triage agent itself
+        reply = {'role': 'assistant', 'parts': [str(result.final_output)]}
+    body.markdown(reply['parts'][0])
+    return reply
+
+
+def main():
+    store = get_session_store()
+    if 'session' not in st.query_params:
+        st.query_params['session'] = uuid.uuid4().hex
+    session_id = st.query_params['session']
+
     if 'history' not in st.session_state:
-        st.session_state['history'] = []
-        intro_message = "Hello! I am an AI Agent. I can translate, and perfrom Calculations. How can I help you?"
-        st.session_state['history'].append({'role': 'assistant', 'parts': [intro_message]})
+        st.session_state['history'] = store.load_tail(session_id)
+        if not st.session_state['history']:
+            intro_message = "Hello! I am an AI Agent. I can translate, and perfrom Calculations. How can I help you?"
+            st.session_state['history'].append({'role': 'assistant', 'parts': [intro_message]})
 
 
+    for message in st.session_state['history']:
+        render_message(message)
+
     chat_input = st.chat_input('Enter your prompt')
-    
-    if chat_input:
-        st.session_state['history'].append({'role': 'user', 'parts': [chat_input]})
 
-        result = await Runner.run(triage_agent, chat_input, run_config=config)
+    if chat_input:
+        user_message = {'role': 'user', 'parts': [chat_input]}
+        st.session_state['history'].append(user_message)
+        render_message(user_message)
 
-        if isinstance(result.final_output, AgentOutput):
-            st.session_state['history'].append({'role': result.final_output.agent_name, 'parts': [result.final_output.response]})
-        else:
-            # Raw response from triage agent itself
-            st.session_state['history'].append({'role': 'assistant', 'parts': [result.final_output]})
+        reply = stream_reply(chat_input)
+        st.session_state['history'].append(reply)
 
+        store.append(session_id, st.session_state['history'][-2:])
+        store.flush()
 
-    for message in st.session_state['history']:
-        role = message['role']
-        content = message['parts'][0]
-        icon = role_icon_map.get(role, "❓")
-        st.chat_message(role, avatar=icon).write(content)
 
 
-asyncio.run(main())
\ No newline at end of file
+main()
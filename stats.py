@@ -0,0 +1,24 @@
+import math
+
+
+def percentile(values: list[float], p: float) -> float:
+    '''Nearest-rank percentile, p in [0, 100].'''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize_latencies(values: list[float]) -> dict:
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values),
+    }
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import asyncio
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from dataclasses import dataclass, field, replace, asdict
+from agents import ItemHelpers, RunResultStreaming, StreamEvent as AgentStreamEvent
+from openai.types.responses import ResponseTextDeltaEvent
+
+
+SINK_QUEUE_SIZE = int(os.getenv('STREAM_SINK_QUEUE_SIZE', '1000'))
+SINK_BATCH_SIZE = int(os.getenv('STREAM_SINK_BATCH_SIZE', '64'))
+SINK_CLOSE_TIMEOUT = float(os.getenv('STREAM_SINK_CLOSE_TIMEOUT', '5'))
+
+KINDS = frozenset({'delta', 'tool_call', 'tool_output', 'message', 'agent_updated'})
+
+
+@dataclass
+class StreamEvent:
+    '''A stream event parsed once and shared by every sink.'''
+    kind: str
+    agent: str
+    text: str = ''
+    data: dict = field(default_factory=dict)
+    time: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def normalize_event(event: AgentStreamEvent, agent: str) -> StreamEvent | None:
+    '''Turn an SDK stream event into a StreamEvent, or None for events no sink cares about.
+    `agent` is the name of the agent currently running, which raw response events don't carry.'''
+    if event.type == 'raw_response_event':
+        if isinstance(event.data, ResponseTextDeltaEvent):
+            return StreamEvent('delta', agent, event.data.delta)
+        return None
+
+    if event.type == 'agent_updated_stream_event':
+        return StreamEvent('agent_updated', event.new_agent.name, event.new_agent.name)
+
+    item = event.item
+    if item.type == 'tool_call_item':
+        raw = item.raw_item
+        name = getattr(raw, 'name', None) or getattr(raw, 'type', 'tool')
+        return StreamEvent('tool_call', item.agent.name, name,
+                           {'call_id': getattr(raw, 'call_id', None), 'arguments': getattr(raw, 'arguments', None)})
+    if item.type == 'tool_call_output_item':
+        return StreamEvent('tool_output', item.agent.name, str(item.output), {'call_id': item.raw_item.get('call_id')})
+    if item.type == 'message_output_item':
+        return StreamEvent('message', item.agent.name, ItemHelpers.text_message_output(item))
+    return None
+
+
+class Sink(ABC):
+    '''Base class for stream consumers. Subclasses implement `write` (and optionally `close`).
+
+    Each sink has its own bounded buffer drained by its own task, so a slow sink only falls
+    behind itself. While it is behind, consecutive deltas are merged into one event, and when the
+    buffer is full the oldest event is dropped (counted in `stats`) rather than blocking the stream.
+    '''
+
+    def __init__(self, kinds: set[str] | None = None, maxsize: int = SINK_QUEUE_SIZE, batch_size: int = SINK_BATCH_SIZE):
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.pending: deque[StreamEvent] = deque()
+        self.ready = asyncio.Event()
+        self.finished = False
+        self.delivered = 0
+        self.dropped = 0
+        self.merged = 0
+        self.errors = 0
+        self.last_error: str | None = None
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    @abstractmethod
+    async def write(self, events: list[StreamEvent]) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+    def offer(self, event: StreamEvent):
+        if self.kinds is not None and event.kind not in self.kinds:
+            return
+
+        if event.kind == 'delta' and self.pending and self.pending[-1].kind == 'delta' and self.pending[-1].agent == event.agent:
+            # Events are shared between sinks, so merge into a copy
+            self.pending[-1] = replace(self.pending[-1], text=self.pending[-1].text + event.text)
+            self.merged += 1
+            return
+
+        if len(self.pending) >= self.maxsize:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(event)
+        self.ready.set()
+
+    def finish(self):
+        self.finished = True
+        self.ready.set()
+
+    async def drain(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.pending:
+                batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+                try:
+                    await self.write(batch)
+                except Exception as e:
+                    # A broken sink must not take the others (or the run) down with it
+                    self.errors += 1
+                    self.last_error = repr(e)
+                self.delivered += len(batch)
+            if self.finished:
+                return
+
+    @property
+    def stats(self) -> dict:
+        return {'delivered': self.delivered, 'merged': self.merged, 'dropped': self.dropped,
+                'pending': len(self.pending), 'errors': self.errors, 'last_error': self.last_error}
+
+
+class StdoutSink(Sink):
+    '''Print a readable log of the run; deltas are only printed if asked for.'''
+
+    def __init__(self, show_deltas: bool = False, **kwargs):
+        kwargs.setdefault('kinds', KINDS if show_deltas else KINDS - {'delta'})
+        super().__init__(**kwargs)
+
+    async def write(self, events: list[StreamEvent]) -> None:
+        for event in events:
+            if event.kind == 'delta':
+                print(event.text, end='', flush=True)
+            elif event.kind == 'agent_updated':
+                print(f'Agent updated: {event.agent}')
+            elif event.kind == 'tool_call':
+                print(f'-- Tool was called: {event.text}')
+            elif event.kind == 'tool_output':
+                print(f'-- Tool output: {event.text}')
+            elif event.kind == 'message':
+                print(f'-- Message output:\n {event.text}')
+
+
+class JSONLSink(Sink):
+    '''Append every event to a JSONL file, one write per batch off the event loop.'''
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.file = open(path, 'a', encoding='utf-8')
+
+    async def write(self, events: list[StreamEvent]) -> None:
+        lines = ''.join(json.dumps(event.to_dict(), ensure_ascii=False) + '\n' for event in events)
+        await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: str):
+        self.file.write(lines)
+        self.file.flush()
+
+    async def close(self) -> None:
+        self.file.close()
+
+
+class SSESink(Sink):
+    '''Write events as server-sent events to an asyncio StreamWriter whose response headers
+    (Content-Type: text/event-stream) have already been sent. Ends with a `done` event.'''
+
+    def __init__(self, writer: asyncio.StreamWriter, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = writer
+
+    async def write(self, events: list[StreamEvent]) -> None:
+        frames = ''.join(f'event: {event.kind}\ndata: {json.dumps(event.to_dict(), ensure_ascii=False)}\n\n' for event in events)
+        self.writer.write(frames.encode())
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        self.writer.write(b'event: done\ndata: {}\n\n')
+        await self.writer.drain()
+
+
+class MetricsSink(Sink):
+    '''Count events per kind and measure time to the first delta.'''
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = time.time()
+        self.counts: Counter[str] = Counter()
+        self.delta_chars = 0
+        self.first_delta: float | None = None
+
+    async def write(self, events: list[StreamEvent]) -> None:
+        for event in events:
+            self.counts[event.kind] += 1
+            if event.kind == 'delta':
+                self.delta_chars += len(event.text)
+                if self.first_delta is None:
+                    self.first_delta = event.time - self.started
+
+    @property
+    def stats(self) -> dict:
+        return {**super().stats, 'counts': dict(self.counts), 'delta_chars': self.delta_chars,
+                'time_to_first_delta': self.first_delta}
+
+
+class StreamPipeline:
+    '''Consume a streamed run once and fan the parsed events out to several sinks.
+
+        result = Runner.run_streamed(agent, input, run_config=config)
+        await StreamPipeline([StdoutSink(), JSONLSink('events.jsonl')]).run(result)
+
+    The model stream never waits on a sink. When the run ends, sinks get `close_timeout`
+    seconds to flush what they have buffered before they are cut off.
+    '''
+
+    def __init__(self, sinks: list[Sink], close_timeout: float = SINK_CLOSE_TIMEOUT):
+        self.sinks = sinks
+        self.close_timeout = close_timeout
+        self.events = 0
+
+    async def run(self, result: RunResultStreaming) -> RunResultStreaming:
+        workers = [asyncio.create_task(sink.drain()) for sink in self.sinks]
+        agent = result.current_agent.name
+        try:
+            async for raw_event in result.stream_events():
+                event = normalize_event(raw_event, agent)
+                if event is None:
+                    continue
+                if event.kind == 'agent_updated':
+                    agent = event.agent
+                self.events += 1
+                for sink in self.sinks:
+                    sink.offer(event)
+        finally:
+            for sink in self.sinks:
+                sink.finish()
+            if workers:
+                _, late = await asyncio.wait(workers, timeout=self.close_timeout)
+                for worker in late:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+            for sink in self.sinks:
+                try:
+                    await sink.close()
+                except Exception as e:
+                    sink.errors += 1
+                    sink.last_error = repr(e)
+        return result
+
+    @property
+    def stats(self) -> dict:
+        return {'events': self.events, 'sinks': {sink.name: sink.stats for sink in self.sinks}}
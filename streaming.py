@@ -1,40 +1,21 @@
-import os
-from dotenv import load_dotenv
-from agents import Agent, Runner, AsyncOpenAI, OpenAIChatCompletionsModel, function_tool, handoff, RunContextWrapper
-from agents.run import RunConfig
+from agents import Agent, Runner, function_tool, handoff, RunContextWrapper
+from provider import get_model, get_run_config
 from pydantic import BaseModel
 from agents.extensions import handoff_filters
 
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+model = get_model()
 
-if not GEMINI_API_KEY:
-    raise ValueError('Gemini API Key is not valid.')
-
-
-external_client = AsyncOpenAI(
-    api_key=GEMINI_API_KEY,
-    base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-)
-
-model = OpenAIChatCompletionsModel(
-    model='gemini-2.0-flash',
-    openai_client=external_client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=external_client,
-    tracing_disabled=True
-)
+config = get_run_config()
 
 
 import asyncio
 import random
-from agents import Agent, ItemHelpers, Runner, function_tool
+from agents import Agent, Runner, function_tool
+from stream_pipeline import StreamPipeline, StdoutSink, MetricsSink
+from tool_cache import cached_tool
 
-@function_tool
+@cached_tool
 def how_many_jokes() -> int:
     return random.randint(1, 10)
 
@@ -54,26 +35,12 @@ async def main():
     )
     print("=== Run starting ===")
 
-    async for event in result.stream_events():
-        # We'll ignore the raw responses event deltas
-        if event.type == "raw_response_event":
-            continue
-        # When the agent updates, print that
-        elif event.type == "agent_updated_stream_event":
-            print(f"Agent updated: {event.new_agent.name}")
-            continue
-        # When items are generated, print them
-        elif event.type == "run_item_stream_event":
-            if event.item.type == "tool_call_item":
-                print("-- Tool was called")
-            elif event.item.type == "tool_call_output_item":
-                print(f"-- Tool output: {event.item.output}")
-            elif event.item.type == "message_output_item":
-                print(f"-- Message output:\n {ItemHelpers.text_message_output(event.item)}")
-            else:
-                pass  # Ignore other event types
+    # Each sink gets the parsed events on its own queue; add a JSONLSink or SSESink to fan out further
+    metrics = MetricsSink()
+    await StreamPipeline([StdoutSink(), metrics]).run(result)
 
     print("=== Run complete ===")
+    print(metrics.stats)
 
 
 if __name__ == "__main__":
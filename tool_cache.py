@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import inspect
+import hashlib
+import argparse
+import importlib
+from agents import FunctionTool, RunContextWrapper, function_tool, __version__ as agents_version
+
+
+# JSON file of generated tool schemas, next to this module by default; empty turns the cache off
+TOOL_SCHEMA_CACHE = os.getenv('TOOL_SCHEMA_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'tool_schemas.json'))
+
+tool_cache_stats = {'hits': 0, 'misses': 0, 'built': 0}
+
+# path -> source key -> schema entry, each file loaded once
+_schemas: dict[str, dict[str, dict]] = {}
+
+
+def _load(path: str) -> dict[str, dict]:
+    if path not in _schemas:
+        try:
+            with open(path, encoding='utf-8') as f:
+                _schemas[path] = json.load(f)
+        except (OSError, ValueError):
+            _schemas[path] = {}
+    return _schemas[path]
+
+
+# Paths that could not be written, e.g. on a read-only filesystem; they are not tried again
+_unwritable: set[str] = set()
+
+
+def _save(path: str):
+    '''Write the cache for `path`. Failing to is not an error: the tools still work, they just
+    get rebuilt on the next start.'''
+    if path in _unwritable:
+        return
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(_schemas[path], f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError:
+        _unwritable.add(path)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+_file_hashes: dict[str, str] = {}
+
+
+def _file_hash(filename: str) -> str:
+    if filename not in _file_hashes:
+        with open(filename, 'rb') as f:
+            _file_hashes[filename] = hashlib.sha256(f.read()).hexdigest()
+    return _file_hashes[filename]
+
+
+def source_key(func, options: dict) -> str | None:
+    '''Hash of everything the generated schema depends on: the source file defining the function,
+    its name, the function_tool options and the SDK version. Hashing the whole file once is much
+    cheaper than extracting each function's source, and any edit to the file invalidates its
+    tools. None if there is no source file, e.g. for functions defined in a REPL.'''
+    code = getattr(inspect.unwrap(func), '__code__', None)
+    try:
+        source = _file_hash(code.co_filename)
+    except (AttributeError, OSError):
+        return None
+    plain = {k: v for k, v in options.items() if not callable(v)}
+    payload = json.dumps([agents_version, func.__module__, func.__qualname__, source, plain], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cached_tool(func=None, *, path: str = TOOL_SCHEMA_CACHE, **function_tool_kwargs) -> FunctionTool:
+    '''Like @function_tool, but the generated name, description and JSON schema are kept in an
+    on-disk cache keyed by source hash, so later process starts skip docstring parsing and
+    pydantic schema generation. The real tool, which validates and dispatches the arguments, is
+    only built on the first call. Editing the function (or its docstring) changes the key.
+    '''
+    def decorator(func) -> FunctionTool:
+        key = source_key(func, function_tool_kwargs) if path else None
+        cached = _load(path).get(key) if key else None
+        if cached is None:
+            tool_cache_stats['misses'] += 1
+            tool = function_tool(func, **function_tool_kwargs)
+            if key:
+                _load(path)[key] = {'name': tool.name, 'description': tool.description,
+                                 'params_json_schema': tool.params_json_schema, 'strict_json_schema': tool.strict_json_schema}
+                _save(path)
+            return tool
+
+        tool_cache_stats['hits'] += 1
+        real: FunctionTool | None = None
+
+        async def on_invoke_tool(ctx: RunContextWrapper, arguments: str):
+            nonlocal real
+            if real is None:
+                tool_cache_stats['built'] += 1
+                real = function_tool(func, **function_tool_kwargs)
+            return await real.on_invoke_tool(ctx, arguments)
+
+        return FunctionTool(on_invoke_tool=on_invoke_tool, **cached)
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the tool schema cache by importing the modules that define tools.')
+    parser.add_argument('modules', nargs='*', default=['func_tool', 'context', 'api_calling', 'streaming'])
+    parser.add_argument('--clear', action='store_true', help='start from an empty cache')
+    args = parser.parse_args()
+
+    if not TOOL_SCHEMA_CACHE:
+        sys.exit('TOOL_SCHEMA_CACHE is empty, nothing to build')
+    if args.clear and os.path.exists(TOOL_SCHEMA_CACHE):
+        os.remove(TOOL_SCHEMA_CACHE)
+    for module in args.modules:
+        importlib.import_module(module)
+    # The imported modules share the `tool_cache` module, not this __main__ copy
+    import tool_cache
+    print(f'{TOOL_SCHEMA_CACHE}: {len(tool_cache._load(TOOL_SCHEMA_CACHE))} schemas, {tool_cache.tool_cache_stats}')
@@ -0,0 +1,85 @@
+import os
+import sys
+import asyncio
+import typing
+import inspect
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from agents import FunctionTool, RunContextWrapper
+from tool_cache import cached_tool
+
+
+TOOL_THREADS = int(os.getenv('TOOL_THREADS', str(min(32, (os.cpu_count() or 1) + 4))))
+TOOL_PROCESSES = int(os.getenv('TOOL_PROCESSES', str(os.cpu_count() or 1)))
+TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', '30'))
+
+_executors: dict[str, Executor] = {}
+
+
+def get_executor(kind: str) -> Executor:
+    if kind not in _executors:
+        if kind == 'thread':
+            _executors[kind] = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix='tool')
+        elif kind == 'process':
+            _executors[kind] = ProcessPoolExecutor(max_workers=TOOL_PROCESSES)
+        else:
+            raise ValueError(f'Unknown executor {kind!r}, use "thread" or "process"')
+    return _executors[kind]
+
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+
+def _make_picklable(func):
+    # Process pools pickle functions by module + qualname, but after decoration the module
+    # attribute is the FunctionTool. Publish the plain function under a private alias instead.
+    alias = f'_{func.__name__}_impl'
+    setattr(sys.modules[func.__module__], alias, func)
+    func.__qualname__ = alias
+
+
+def pooled_tool(func=None, *, executor: str = 'thread', timeout: float | None = TOOL_TIMEOUT,
+                max_concurrency: int | None = None, **function_tool_kwargs) -> FunctionTool:
+    '''Like @function_tool, but sync functions run in a shared thread or process pool instead of
+    blocking the event loop. Async functions still run on the loop.
+
+    Every call is bounded by `timeout` seconds and at most `max_concurrency` calls of this tool
+    run at once. A timeout is reported to the model as a tool error. A thread cannot be
+    interrupted, so the timed-out call keeps its worker until it returns.
+    '''
+    def decorator(func) -> FunctionTool:
+        is_async = inspect.iscoroutinefunction(func)
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        if not is_async and executor == 'process':
+            if any(typing.get_origin(hint) is RunContextWrapper or hint is RunContextWrapper for hint in typing.get_type_hints(func).values()):
+                raise TypeError('Tools that take the run context cannot run in a process pool')
+            _make_picklable(func)
+
+        async def invoke(args, kwargs):
+            if is_async:
+                return await func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_executor(executor), functools.partial(func, *args, **kwargs))
+
+        async def invoke_with_timeout(args, kwargs):
+            try:
+                return await asyncio.wait_for(invoke(args, kwargs), timeout)
+            except TimeoutError:
+                raise TimeoutError(f'{func.__name__} did not finish within {timeout}s')
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if semaphore is None:
+                return await invoke_with_timeout(args, kwargs)
+            async with semaphore:
+                return await invoke_with_timeout(args, kwargs)
+
+        return cached_tool(wrapper, **function_tool_kwargs)
+
+    if func is not None:
+        return decorator(func)
+    return decorator
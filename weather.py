@@ -0,0 +1,80 @@
+import os
+import asyncio
+import random
+import httpx
+from provider import get_http_client
+from cache import TTLCache, SQLiteStore
+
+
+WEATHER_BASE_URL = os.getenv('WEATHER_BASE_URL', 'http://api.weatherapi.com/v1/')
+WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', '8e3aca2b91dc4342a1162608252604')
+WEATHER_TIMEOUT = float(os.getenv('WEATHER_TIMEOUT', '5'))
+WEATHER_RETRIES = int(os.getenv('WEATHER_RETRIES', '3'))
+WEATHER_BACKOFF = float(os.getenv('WEATHER_BACKOFF', '0.5'))
+WEATHER_CACHE_TTL = float(os.getenv('WEATHER_CACHE_TTL', '600'))
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', '256'))
+# Set to a file path (e.g. weather_cache.db) to keep cached weather across restarts
+WEATHER_CACHE_PATH = os.getenv('WEATHER_CACHE_PATH')
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class WeatherError(Exception):
+    pass
+
+
+weather_cache = TTLCache(
+    maxsize=WEATHER_CACHE_SIZE,
+    ttl=WEATHER_CACHE_TTL,
+    store=SQLiteStore(WEATHER_CACHE_PATH, table='weather') if WEATHER_CACHE_PATH else None
+)
+
+
+def normalize_city(city: str) -> str:
+    return ' '.join(city.lower().replace(',', ' ').split())
+
+
+async def fetch_weather(city: str, timeout: float = WEATHER_TIMEOUT, retries: int = WEATHER_RETRIES) -> dict:
+    '''Fetch current weather for a city from weatherapi.com.
+
+    Transport errors, timeouts and 429/5xx responses are retried up to `retries` more times
+    with jittered exponential backoff. Anything else raises WeatherError straight away.
+    '''
+    client = get_http_client(WEATHER_BASE_URL)
+    url = f'{WEATHER_BASE_URL}current.json'
+
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params={'key': WEATHER_API_KEY, 'q': city}, timeout=timeout)
+        except httpx.TransportError as e:
+            error = WeatherError(f'Weather API unreachable: {e!r}')
+        else:
+            if response.status_code == 200:
+                return response.json()
+
+            try:
+                message = response.json()['error']['message']
+            except Exception:
+                message = response.text
+            error = WeatherError(f'Weather API returned {response.status_code}: {message}')
+
+            if response.status_code not in RETRYABLE_STATUS:
+                raise error
+
+        if attempt < retries:
+            await asyncio.sleep(WEATHER_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    raise error
+
+
+def format_weather(data: dict) -> str:
+    return f"{data['current']['temp_c']}°C with {data['current']['condition']['text']}"
+
+
+async def get_weather_text(city: str) -> str:
+    '''Weather summary for the tool layer. Failures come back as text so the model can report them.'''
+    try:
+        data = await weather_cache.get_or_fetch(normalize_city(city), lambda: fetch_weather(city))
+        return format_weather(data)
+    except WeatherError as e:
+        return f'Could not fetch weather for {city}. {e}'